@@ -0,0 +1,118 @@
+# agents/knowledge_base.py
+
+import os
+import sys
+import json
+import hashlib
+import threading
+from types import MappingProxyType
+from typing import List, Dict, Union, Mapping, Tuple
+
+KNOWLEDGE_BASE_PATH = "configs/knowledge_base.json"
+
+class KnowledgeBaseIndex:
+    """
+    Immutable, in-memory index of the rule knowledge base.
+
+    Every distinct rule string is interned once in `rules`; the index maps
+    profile key -> profile value -> tuple of rule ids into that table.
+    `version` is a content hash of the source file, for keying derived caches.
+    """
+
+    def __init__(
+        self,
+        rules: Tuple[str, ...],
+        index: Mapping[str, Mapping[str, Tuple[int, ...]]],
+        mtime: float,
+        version: str = "",
+    ):
+        self.rules = rules
+        self.index = index
+        self.mtime = mtime
+        self.version = version
+
+    def rule_ids_for_profile(self, student_profile: Dict[str, Union[str, List[str]]]) -> List[int]:
+        """
+        Returns the rule ids for every key/value of the profile, in profile order.
+        """
+        rule_ids = []
+        for key, value in student_profile.items():
+            values = self.index.get(key)
+            if values is None:
+                continue
+            if isinstance(value, str):
+                value = (value,)
+            elif not isinstance(value, list):
+                continue
+            for item in value:
+                ids = values.get(item)
+                if ids:
+                    rule_ids.extend(ids)
+        return rule_ids
+
+    def rules_for_profile(self, student_profile: Dict[str, Union[str, List[str]]]) -> List[str]:
+        """
+        Returns the rule strings for a whole profile in a single pass.
+        """
+        rules = self.rules
+        return [rules[i] for i in self.rule_ids_for_profile(student_profile)]
+
+def build_index(
+    rule_base: Dict[str, Dict[str, List[str]]],
+    mtime: float = 0.0,
+    version: str = "",
+) -> KnowledgeBaseIndex:
+    """
+    Builds a KnowledgeBaseIndex from the raw knowledge base JSON structure.
+    """
+    rule_ids: Dict[str, int] = {}
+    rules: List[str] = []
+    index = {}
+
+    for key, values in rule_base.items():
+        if not isinstance(values, dict):
+            continue
+        value_index = {}
+        for value, value_rules in values.items():
+            ids = []
+            for rule in value_rules:
+                rule_id = rule_ids.get(rule)
+                if rule_id is None:
+                    rule_id = len(rules)
+                    rule_ids[rule] = rule_id
+                    rules.append(sys.intern(rule))
+                ids.append(rule_id)
+            value_index[value] = tuple(ids)
+        index[key] = MappingProxyType(value_index)
+
+    return KnowledgeBaseIndex(tuple(rules), MappingProxyType(index), mtime, version)
+
+def load_knowledge_base(path: str = KNOWLEDGE_BASE_PATH) -> KnowledgeBaseIndex:
+    """
+    Reads and indexes the knowledge base file.
+    """
+    mtime = os.stat(path).st_mtime
+    with open(path, "rb") as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()[:16]
+    return build_index(json.loads(raw), mtime, version)
+
+_indexes: Dict[str, KnowledgeBaseIndex] = {}
+_lock = threading.Lock()
+
+def get_knowledge_base(path: str = KNOWLEDGE_BASE_PATH) -> KnowledgeBaseIndex:
+    """
+    Returns the cached index for `path`, reloading it only when the file's mtime changes.
+    """
+    mtime = os.stat(path).st_mtime
+    kb = _indexes.get(path)
+    if kb is not None and kb.mtime == mtime:
+        return kb
+
+    with _lock:
+        kb = _indexes.get(path)
+        if kb is None or kb.mtime != mtime:
+            kb = load_knowledge_base(path)
+            _indexes[path] = kb
+            print(f"[KnowledgeBase] Loaded {len(kb.rules)} rules from {path}")
+        return kb
@@ -1,45 +1,45 @@
-import json
 from typing import List, Dict, Union
-import os, ast
-from openai import OpenAI
+import os, ast, asyncio
+from openai import AsyncOpenAI
+from agents.knowledge_base import KNOWLEDGE_BASE_PATH, get_knowledge_base
+from utils.cache import ResponseCache, make_cache_key
+from utils.llm_usage import openai_call, prompt_parts
 
-# Path to the knowledge base
-KNOWLEDGE_BASE_PATH = "configs/knowledge_base.json"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-def generate_cleaned_rules(student_profile: Dict[str, Union[str, List[str]]]) -> List[str]:
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+FILTER_MODEL = "gpt-4o"
+FILTER_TEMPERATURE = 0.2
+
+# Bump when build_filter_prompt changes so old filter results are not reused.
+FILTER_PROMPT_VERSION = "1"
+
+# Filtered rule lists persist under data/cache/rule_filter and expire after
+# RULE_FILTER_CACHE_TTL seconds (default 30 days). Keys also carry the
+# knowledge base content hash, so editing the knowledge base invalidates them.
+rule_filter_cache = ResponseCache(
+    "rule_filter",
+    max_items=1024,
+    max_disk_bytes=20 * 1024 * 1024,
+    ttl=float(os.getenv("RULE_FILTER_CACHE_TTL", str(30 * 24 * 3600))),
+)
+_inflight_filters: Dict[str, asyncio.Future] = {}
+
+async def agenerate_cleaned_rules(student_profile: Dict[str, Union[str, List[str]]]) -> List[str]:
     rules_to_apply = extract_rules_from_knowledge_base(student_profile)
 
-    cleaned_rules = filter_rules_with_llm(rules_to_apply)
+    cleaned_rules = await afilter_rules_with_llm(rules_to_apply)
     return cleaned_rules
 
 def extract_rules_from_knowledge_base(student_profile: Dict[str, Union[str, List[str]]]) -> List[str]:
     """
     Extract relevant rules based on the student profile.
+    Uses the in-memory knowledge base index (reloaded only when the file changes).
     """
-    with open(KNOWLEDGE_BASE_PATH, "r") as f:
-        rule_base = json.load(f)
-
-    extracted_rules = []
-
-    for key, value in student_profile.items():
-        if key in rule_base:
-            if isinstance(value, list):
-                for item in value:
-                    if item in rule_base[key]:
-                        extracted_rules.extend(rule_base[key][item])
-            elif isinstance(value, str):
-                if value in rule_base[key]:
-                    extracted_rules.extend(rule_base[key][value])
-
-    return extracted_rules
-
-import time
+    return get_knowledge_base(KNOWLEDGE_BASE_PATH).rules_for_profile(student_profile)
 
-def filter_rules_with_llm(rules: List[str]) -> List[str]:
-
-    prompt = f"""
+def build_filter_prompt(rules: List[str]) -> str:
+    return f"""
 You are an expert lesson adaptation rule optimizer.
 
 Below is a list of adaptation rules derived from a student's profile:
@@ -63,17 +63,66 @@ Return only the optimized list in valid Python list format (e.g. ["rule1", "rule
 Optimized Rule List:
 """
 
+def canonicalize_rules(rules: List[str]) -> List[str]:
+    """
+    Deduplicated, sorted rule list; profiles that yield the same set share one filter result.
+    """
+    return sorted(set(rules))
+
+def filter_cache_key(canonical_rules: List[str]) -> str:
+    kb_version = get_knowledge_base(KNOWLEDGE_BASE_PATH).version
+    return make_cache_key(
+        "rule_filter",
+        canonical_rules,
+        kb_version,
+        FILTER_MODEL,
+        FILTER_PROMPT_VERSION,
+        FILTER_TEMPERATURE,
+    )
+
+async def afilter_rules_with_llm(rules: List[str]) -> List[str]:
+    """
+    Drops rules that would not change the adapted lesson (GPT-4o). Concurrent
+    calls for the same canonical rule set share a single in-flight LLM request.
+    """
+    canonical_rules = canonicalize_rules(rules)
+    key = filter_cache_key(canonical_rules)
+    cached = rule_filter_cache.get(key)
+    if cached is not None:
+        return list(cached)
+
+    inflight = _inflight_filters.get(key)
+    if inflight is None:
+        inflight = asyncio.ensure_future(_afilter_uncached(key, canonical_rules))
+        _inflight_filters[key] = inflight
+        inflight.add_done_callback(lambda _: _inflight_filters.pop(key, None))
+
+    return list(await asyncio.shield(inflight))
+
+async def _afilter_uncached(key: str, canonical_rules: List[str]) -> List[str]:
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            timeout=30  # Add timeout to avoid infinite hang
-        )
+        messages = [{"role": "user", "content": build_filter_prompt(canonical_rules)}]
+        parts = prompt_parts(messages, rules=sum(len(rule) for rule in canonical_rules))
+        with openai_call("rule_agent.filter", FILTER_MODEL, parts) as call:
+            response = await async_client.chat.completions.create(
+                model=FILTER_MODEL,
+                messages=messages,
+                temperature=FILTER_TEMPERATURE,
+                timeout=30  # Add timeout to avoid infinite hang
+            )
+            call.usage = response.usage
     except Exception as e:
         raise ValueError(f"[RuleAgent] LLM call failed: {e}")
 
-    raw_output = response.choices[0].message.content.strip()
+    cleaned_rules = parse_rule_list(response.choices[0].message.content)
+    rule_filter_cache.set(key, cleaned_rules)
+    return cleaned_rules
+
+def parse_rule_list(raw_output: str) -> List[str]:
+    """
+    Parses the LLM's Python-list answer, tolerating ``` fences around it.
+    """
+    raw_output = raw_output.strip()
 
     if raw_output.startswith("```"):
         raw_output = raw_output.strip("`")
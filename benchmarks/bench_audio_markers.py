@@ -0,0 +1,65 @@
+# benchmarks/bench_audio_markers.py
+#
+# [AUDIO:...] marker insertion: the old per-chunk str.replace loop against the
+# single-pass insert_audio_markers used by audio_node. No TTS calls are made.
+# Run from the repo root:  python -m benchmarks.bench_audio_markers --paragraphs 100 500 2000
+
+import os
+import time
+import argparse
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-offline")  # clients are built at import
+
+from tools.audio.generate import split_text_for_audio_with_offsets
+from graph.nodes.audio_node import insert_audio_markers
+
+PARAGRAPH = (
+    "Daedalus watched the seabirds for days, studying how their feathers "
+    "overlapped, before he began to build the wings. "
+)
+
+def make_lesson(paragraphs: int) -> str:
+    blocks = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            blocks.append("### Check for understanding")  # repeated paragraph
+        else:
+            blocks.append(f"{i}. {PARAGRAPH * (1 + i % 4)}")
+    return "\n\n".join(blocks)
+
+def legacy_insert(lesson_text: str, audio_results: list) -> str:
+    for path, text in audio_results:
+        filename = os.path.basename(path)
+        lesson_text = lesson_text.replace(text, f"{text}\n\n[AUDIO:{filename}]")
+    return lesson_text
+
+def best_of(repeat: int, fn, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Audio marker insertion: replace loop vs single pass")
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':<12}{'chars':>10}{'replace loop (ms)':>20}{'single pass (ms)':>19}{'speedup':>10}")
+    for paragraphs in args.paragraphs:
+        lesson = make_lesson(paragraphs)
+        spans = split_text_for_audio_with_offsets(lesson)
+        urls = [f"https://example.test/audio/audio_{i:05d}.mp3" for i in range(len(spans))]
+        audio_results = [(url, chunk.strip()) for (_, _, chunk), url in zip(spans, urls)]
+
+        legacy = best_of(args.repeat, legacy_insert, lesson, audio_results)
+        single = best_of(args.repeat, insert_audio_markers, lesson, spans, urls)
+        print(
+            f"{paragraphs:<12}{len(lesson):>10}{legacy * 1000:>20.2f}"
+            f"{single * 1000:>19.2f}{legacy / single:>9.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
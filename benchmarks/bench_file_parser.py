@@ -0,0 +1,79 @@
+# benchmarks/bench_file_parser.py
+#
+# Serial vs parallel text extraction on synthetic multi-hundred-page documents.
+# Run from the repo root:  python -m benchmarks.bench_file_parser --pages 100 300 600
+
+import os
+import time
+import argparse
+import tempfile
+
+import fitz  # PyMuPDF
+import pptx
+
+from utils import file_parser
+
+PARAGRAPH = (
+    "Daedalus was a skilled craftsman who built the Labyrinth for King Minos. "
+    "Trapped on the island of Crete, he made wings of feathers and wax for "
+    "himself and his son Icarus, and warned him not to fly too close to the sun."
+)
+
+def make_pdf(path: str, pages: int, paragraphs_per_page: int = 12) -> None:
+    doc = fitz.open()
+    body = "\n".join(f"{p + 1}. {PARAGRAPH}" for p in range(paragraphs_per_page))
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(36, 36, 576, 756), f"Page {i + 1}\n{body}", fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def make_pptx(path: str, slides: int) -> None:
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[1]
+    for i in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {i + 1}"
+        slide.placeholders[1].text = "\n".join([PARAGRAPH] * 4)
+    presentation.save(path)
+
+def best_of(repeat: int, fn, *args, **kwargs) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serial vs parallel document text extraction")
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Start the worker processes before timing anything
+        warm = os.path.join(tmp, "warm.pdf")
+        make_pdf(warm, 8)
+        file_parser.extract_text_from_pdf(warm, parallel=True)
+
+        print(f"{'document':<16}{'serial (s)':>12}{'parallel (s)':>14}{'speedup':>10}")
+        for pages in args.pages:
+            pdf_path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            make_pdf(pdf_path, pages)
+
+            serial_text = file_parser.extract_text_from_pdf(pdf_path, parallel=False)
+            parallel_text = file_parser.extract_text_from_pdf(pdf_path, parallel=True)
+            assert serial_text == parallel_text, "parallel extraction changed the text"
+
+            serial = best_of(args.repeat, file_parser.extract_text_from_pdf, pdf_path, parallel=False)
+            parallel = best_of(args.repeat, file_parser.extract_text_from_pdf, pdf_path, parallel=True)
+            print(f"{f'pdf/{pages}p':<16}{serial:>12.3f}{parallel:>14.3f}{serial / parallel:>9.1f}x")
+
+            pptx_path = os.path.join(tmp, f"synthetic_{pages}.pptx")
+            make_pptx(pptx_path, pages)
+            elapsed = best_of(args.repeat, file_parser.extract_text_from_pptx, pptx_path)
+            print(f"{f'pptx/{pages}s':<16}{elapsed:>12.3f}{'-':>14}{'-':>10}")
+
+if __name__ == "__main__":
+    main()
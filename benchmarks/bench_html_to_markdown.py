@@ -0,0 +1,89 @@
+# benchmarks/bench_html_to_markdown.py
+#
+# /api/save_markdown conversion: the old BeautifulSoup clean-up + fresh
+# html2text pipeline against the single-pass EditorMarkdownConverter, on
+# synthetic editor documents of growing size. Also checks both give the
+# same markdown.
+# Run from the repo root:  python -m benchmarks.bench_html_to_markdown --sections 50 200 1000
+
+import time
+import argparse
+
+import html2text
+from bs4 import BeautifulSoup
+
+from tools.output.html_to_markdown import editor_html_to_markdown
+
+SECTION = """
+<h2 contenteditable="true" class="section">Part {i}: Daedalus &amp; Icarus</h2>
+<p style="margin: 0" data-id="p{i}">Daedalus watched the seabirds for days,&nbsp;studying how their
+feathers overlapped. <strong>Why</strong> did he use <em>wax</em> &lt;and&gt; thread?</p>
+<audio controls class="fixed-media" draggable="true">
+  <source src="https://langgraph-lesson-modifier.onrender.com/audio/audio_{i:032x}.mp3" type="audio/mpeg">
+</audio>
+<h3>{i}. Check for understanding</h3>
+<ul><li>Name one material.</li><li>What happened to the wings near the sun?</li></ul>
+<p><span data-type="image" class="placeholder">[IMAGE: image_{i:032x}.webp] ✎ edit</span></p>
+<p><img src="https://langgraph-lesson-modifier.onrender.com/images/image_{i:032x}_thumb.webp" alt="wings">
+<a href="https://example.org/myth?id={i}&amp;lang=en">Read more</a></p>
+"""
+
+def make_document(sections: int) -> str:
+    return "<div>" + "".join(SECTION.format(i=i) for i in range(sections)) + "</div>"
+
+def legacy_convert(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup.find_all(True):
+        for attr in ["style", "class", "contenteditable", "data-type", "data-id"]:
+            tag.attrs.pop(attr, None)
+
+    for audio in soup.find_all("audio"):
+        source_tag = audio.find("source")
+        if source_tag and source_tag.has_attr("src"):
+            placeholder = f"[AUDIO: {source_tag['src']}]"
+        else:
+            placeholder = "[AUDIO]"
+        audio.replace_with(f"\n\n{placeholder}\n\n")
+
+    for span in soup.find_all("span"):
+        text = span.get_text(strip=True)
+        if "[IMAGE:" in text:
+            cleaned = text.split("✎")[0].strip()
+            span.replace_with(f"\n\n{cleaned}\n\n")
+
+    converter = html2text.HTML2Text()
+    converter.body_width = 0
+    converter.ignore_links = False
+    converter.ignore_images = False
+    converter.ignore_emphasis = False
+    converter.protect_links = True
+    return converter.handle(str(soup))
+
+def best_of(repeat: int, fn, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Editor HTML -> markdown: BeautifulSoup pipeline vs single pass")
+    parser.add_argument("--sections", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'sections':<10}{'KiB':>8}{'soup+html2text (ms)':>22}{'single pass (ms)':>19}{'speedup':>10}{'same':>6}")
+    for sections in args.sections:
+        document = make_document(sections)
+        same = legacy_convert(document) == editor_html_to_markdown(document)
+
+        legacy = best_of(args.repeat, legacy_convert, document)
+        single = best_of(args.repeat, editor_html_to_markdown, document)
+        print(
+            f"{sections:<10}{len(document.encode()) / 1024:>8.0f}{legacy * 1000:>22.1f}"
+            f"{single * 1000:>19.1f}{legacy / single:>9.1f}x{'yes' if same else 'NO':>6}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+# benchmarks/suite.py
+#
+# Offline micro-benchmarks for the pure-Python hot paths, each over a few
+# input sizes. No network or API calls are made; generated files go to a
+# temporary working directory.
+#
+# Run from the repo root:
+#   python -m benchmarks.suite                                  # print timings
+#   python -m benchmarks.suite --save benchmarks/baseline.json  # record a baseline
+#   python -m benchmarks.suite --compare benchmarks/baseline.json
+#
+# --compare exits with status 1 when any case is slower than its baseline by
+# more than --threshold (default 25%) and by at least --min-delta-ms, so
+# jitter on microsecond-scale cases does not fail the run. Baselines are
+# machine specific: record one on the machine you compare on, before
+# touching the module.
+
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple
+from xml.sax.saxutils import escape
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-offline")  # clients are built at import
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Case(NamedTuple):
+    name: str
+    param: str            # what the sizes measure, e.g. "paragraphs"
+    sizes: List[int]
+    quick_sizes: List[int]
+    setup: Callable       # setup(size) -> zero-argument callable to time
+
+# ----- fixtures -----
+
+PARAGRAPH = (
+    "Daedalus watched the seabirds for days, studying how their feathers "
+    "overlapped, before he began to build the wings for himself and Icarus."
+)
+
+def make_lesson(paragraphs: int) -> str:
+    """
+    Lesson text shaped like the model output: title, sections, numbered
+    questions, labels and media placeholders.
+    """
+    lines = ["Title: The Myth of Daedalus and Icarus", ""]
+    for i in range(paragraphs):
+        if i % 25 == 0:
+            lines += [f"Day {i // 25 + 1} Instructions", ""]
+        if i % 10 == 3:
+            lines += [f"{i}. Why did Daedalus warn Icarus about the sun?", ""]
+        elif i % 10 == 6:
+            lines += ["Vocabulary:", ""]
+        elif i % 10 == 8:
+            lines += [f"[Insert Image: wings of feathers and wax {i}]", ""]
+        elif i % 10 == 9:
+            lines += [f"[Insert Audio: read paragraph {i} aloud]", ""]
+        else:
+            lines += [PARAGRAPH, ""]
+    return "\n".join(lines)
+
+def make_docx(path: str, paragraphs: int) -> None:
+    """
+    Minimal WordprocessingML package (enough for docx2txt), built with zipfile.
+    """
+    body = "".join(
+        f"<w:p><w:r><w:t>{escape(f'{i + 1}. {PARAGRAPH}')}</w:t></w:r></w:p>" for i in range(paragraphs)
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        docx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="word/document.xml"/>'
+            '</Relationships>'
+        ))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{body}</w:body></w:document>'
+        ))
+
+def make_profile(width: int) -> Dict[str, List[str]]:
+    """
+    Student profile using the first `width` knowledge base keys, up to three values each.
+    """
+    from agents.knowledge_base import KNOWLEDGE_BASE_PATH, get_knowledge_base
+    kb = get_knowledge_base(KNOWLEDGE_BASE_PATH)
+    return {key: list(values)[:3] for key, values in list(kb.index.items())[:width]}
+
+# ----- cases -----
+
+def setup_split_text_into_chunks(paragraphs: int):
+    from tools.llm.chunking import split_text_into_chunks
+    text = make_lesson(paragraphs)
+    return lambda: split_text_into_chunks(text, 5, budget=0)
+
+def setup_extract_rules(width: int):
+    from agents.rule_agent import extract_rules_from_knowledge_base
+    profile = make_profile(width)
+    return lambda: extract_rules_from_knowledge_base(profile)
+
+def setup_generate_final_output(paragraphs: int):
+    from tools.output.generate import generate_final_output
+    text = make_lesson(paragraphs)
+    return lambda: generate_final_output(text)
+
+def setup_render_markdown(paragraphs: int):
+    from tools.output.generate import tokenize_lesson, render_markdown
+    text = make_lesson(paragraphs)
+    return lambda: render_markdown(tokenize_lesson(text))
+
+def setup_render_json(paragraphs: int):
+    from tools.output.generate import tokenize_lesson, render_json
+    text = make_lesson(paragraphs)
+    return lambda: render_json(tokenize_lesson(text))
+
+def setup_save_markdown_html(sections: int):
+    from benchmarks.bench_html_to_markdown import make_document
+    from tools.output.html_to_markdown import editor_html_to_markdown
+    document = make_document(sections)
+    return lambda: editor_html_to_markdown(document)
+
+def setup_audio_markers(paragraphs: int):
+    from tools.audio.generate import split_text_for_audio_with_offsets
+    from graph.nodes.audio_node import insert_audio_markers
+    lesson = make_lesson(paragraphs)
+    urls = [f"https://example.test/audio/audio_{i:032x}.mp3" for i in range(len(split_text_for_audio_with_offsets(lesson)))]
+
+    def run():
+        spans = split_text_for_audio_with_offsets(lesson)
+        return insert_audio_markers(lesson, spans, urls)
+    return run
+
+def setup_extract_pdf(pages: int):
+    from benchmarks.bench_file_parser import make_pdf
+    from utils.file_parser import extract_text_from_file
+    path = os.path.abspath(f"fixture_{pages}.pdf")
+    make_pdf(path, pages)
+    return lambda: extract_text_from_file(path)
+
+def setup_extract_docx(pages: int):
+    from utils.file_parser import extract_text_from_file
+    path = os.path.abspath(f"fixture_{pages}.docx")
+    make_docx(path, pages * 12)  # ~12 paragraphs per page, like the PDF fixture
+    return lambda: extract_text_from_file(path)
+
+def setup_extract_pptx(slides: int):
+    from benchmarks.bench_file_parser import make_pptx
+    from utils.file_parser import extract_text_from_file
+    path = os.path.abspath(f"fixture_{slides}.pptx")
+    make_pptx(path, slides)
+    return lambda: extract_text_from_file(path)
+
+CASES = [
+    Case("split_text_into_chunks", "paragraphs", [100, 1000, 10000], [100, 1000], setup_split_text_into_chunks),
+    Case("extract_rules_from_knowledge_base", "profile_keys", [1, 5, 21], [1, 21], setup_extract_rules),
+    Case("generate_final_output", "paragraphs", [100, 1000, 5000], [100, 1000], setup_generate_final_output),
+    Case("render_markdown", "paragraphs", [100, 1000, 5000], [100, 1000], setup_render_markdown),
+    Case("render_json", "paragraphs", [100, 1000, 5000], [100, 1000], setup_render_json),
+    Case("save_markdown_html", "sections", [10, 100, 500], [10, 100], setup_save_markdown_html),
+    Case("audio_markers", "paragraphs", [100, 1000, 5000], [100, 1000], setup_audio_markers),
+    Case("extract_text_pdf", "pages", [10, 100, 300], [10, 100], setup_extract_pdf),
+    Case("extract_text_docx", "pages", [10, 100, 300], [10, 100], setup_extract_docx),
+    Case("extract_text_pptx", "slides", [10, 100, 300], [10, 100], setup_extract_pptx),
+]
+
+# ----- runner -----
+
+def measure(fn: Callable, repeat: int, min_sample_seconds: float = 0.05) -> dict:
+    """
+    Per-call timings in ms: loops are batched so each sample takes at least
+    `min_sample_seconds`, then the best and median of `repeat` samples are kept.
+    """
+    fn()  # warm-up (imports, caches, worker processes)
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_seconds:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int(min_sample_seconds / elapsed) + 1)
+
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return {
+        "best_ms": round(min(samples) * 1000, 4),
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "loops": loops,
+    }
+
+def run_suite(cases: List[Case], quick: bool, repeat: int) -> Dict[str, dict]:
+    results = {}
+    for case in cases:
+        for size in (case.quick_sizes if quick else case.sizes):
+            key = f"{case.name}[{case.param}={size}]"
+            results[key] = measure(case.setup(size), repeat)
+            print(f"{key:<58}{results[key]['best_ms']:>12.3f}{results[key]['median_ms']:>12.3f}", flush=True)
+    return results
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float, min_delta_ms: float) -> List[str]:
+    print(f"\n{'case':<58}{'baseline':>12}{'now':>12}{'change':>10}")
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"{key:<58}{'-':>12}{result['best_ms']:>12.3f}{'new':>10}")
+            continue
+        change = result["best_ms"] / before["best_ms"] - 1 if before["best_ms"] else 0.0
+        slower = change > threshold and result["best_ms"] - before["best_ms"] >= min_delta_ms
+        flag = "  << slower" if slower else ""
+        print(f"{key:<58}{before['best_ms']:>12.3f}{result['best_ms']:>12.3f}{change:>+9.0%}{flag}")
+        if slower:
+            regressions.append(key)
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for the lesson pipeline hot paths")
+    parser.add_argument("--only", nargs="+", help="run only cases whose name contains one of these")
+    parser.add_argument("--quick", action="store_true", help="smaller input sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="PATH", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    cases = [c for c in CASES if not args.only or any(part in c.name for part in args.only)]
+    save_path = os.path.abspath(args.save) if args.save else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    baseline = None
+    if compare_path:
+        with open(compare_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    with tempfile.TemporaryDirectory(prefix="lesson-bench-") as workdir:
+        # Outputs, caches and fixtures land in the temp dir; the knowledge base is read from the repo
+        os.symlink(os.path.join(REPO_ROOT, "configs"), os.path.join(workdir, "configs"))
+        os.chdir(workdir)
+        os.environ.setdefault("OUTPUT_GC_INTERVAL_SECONDS", "0")
+
+        print(f"{'case':<58}{'best (ms)':>12}{'median (ms)':>12}")
+        results = run_suite(cases, args.quick, args.repeat)
+        os.chdir(REPO_ROOT)
+
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "processor": platform.processor() or platform.machine(),
+                    "quick": args.quick,
+                    "repeat": args.repeat,
+                },
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {save_path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
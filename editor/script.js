@@ -90,7 +90,8 @@ document.addEventListener("DOMContentLoaded", () => {
 
         images.forEach(url => {
           const img = document.createElement("img");
-          img.src = url;
+          // Normalized images ship with a small "_thumb.webp" variant for previews
+          img.src = url.endsWith(".webp") ? url.replace(/\.webp$/, "_thumb.webp") : url;
           img.style.width = "100%";
           img.style.margin = "5px 0";
           img.style.cursor = "pointer";
@@ -0,0 +1,179 @@
+# graph/batch.py
+
+import os
+import asyncio
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from agents.rule_agent import agenerate_cleaned_rules, canonicalize_rules
+from graph.schema import State
+from graph.nodes.download_lesson_node import adownload_lesson_node
+from graph.lesson_graph_from_content import lesson_from_content_app
+from graph.nodes.modify_lesson_node import adaptation_limiter
+from utils.metrics import instrument_node
+
+# Unique rule sets adapted at the same time for one batch. Each adaptation
+# also runs up to MODIFY_DAY_CONCURRENCY GPT-4o calls of its own.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Student profiles whose rules are generated (knowledge base lookup plus the
+# GPT-4o rule filter) at the same time for one batch
+BATCH_RULE_CONCURRENCY = int(os.getenv("BATCH_RULE_CONCURRENCY", "8"))
+
+# GPT-4o adaptation calls in flight across all lessons of one multi-lesson batch
+LESSON_BATCH_CONCURRENCY = int(os.getenv("LESSON_BATCH_CONCURRENCY", "6"))
+
+Profile = Dict[str, Union[str, List[str]]]
+
+class LessonSpec(NamedTuple):
+    lesson_url: str
+    file_category: str = "Lesson"
+    number_of_days: int = 1
+
+class LessonResult(NamedTuple):
+    """
+    state: final graph state, or None if the lesson failed (see error)
+    """
+    index: int
+    lesson: LessonSpec
+    state: Optional[dict]
+    error: Optional[str]
+
+class RuleSetResult(NamedTuple):
+    """
+    One adaptation shared by every student whose profile yields the same rules.
+    state: final graph state, or None if the adaptation failed (see error)
+    """
+    students: List[str]
+    rules: List[str]
+    state: Optional[dict]
+    error: Optional[str]
+
+async def load_lesson(lesson_url: str) -> State:
+    """
+    Downloads and parses a lesson once for a batch (timed like the graph's own node).
+    """
+    download = instrument_node("download_lesson_node", adownload_lesson_node)
+    return await download(State(lesson_url=lesson_url))
+
+async def adapt_for_profiles(
+    lesson_url: str,
+    profiles: Dict[str, Profile],
+    number_of_days: int = 1,
+    file_category: str = "Lesson",
+    bypass_cache: bool = False,
+    concurrency: int = BATCH_CONCURRENCY,
+    rule_concurrency: int = BATCH_RULE_CONCURRENCY,
+) -> Tuple[Dict[str, str], List[RuleSetResult]]:
+    """
+    Adapts one lesson for many students: the lesson is downloaded and parsed
+    once, rules are generated per profile (at most `rule_concurrency` at a
+    time), and each distinct rule set is adapted once (at most `concurrency`
+    at a time).
+
+    Returns (rule errors by student id, one RuleSetResult per distinct rule set).
+    Raises if the lesson itself cannot be loaded.
+    """
+    lesson = await load_lesson(lesson_url)
+
+    # Profiles with the same rules share the filter call (see afilter_rules_with_llm)
+    rule_semaphore = asyncio.Semaphore(max(1, rule_concurrency))
+
+    async def generate_rules(profile: Profile) -> List[str]:
+        async with rule_semaphore:
+            return await agenerate_cleaned_rules(profile)
+
+    student_ids = list(profiles)
+    outcomes = await asyncio.gather(
+        *(generate_rules(profiles[student_id]) for student_id in student_ids),
+        return_exceptions=True
+    )
+
+    rule_errors: Dict[str, str] = {}
+    rule_sets: Dict[Tuple[str, ...], Tuple[List[str], List[str]]] = {}
+    for student_id, outcome in zip(student_ids, outcomes):
+        if isinstance(outcome, Exception):
+            rule_errors[student_id] = f"Rule generation failed: {outcome}"
+        elif not outcome:
+            rule_errors[student_id] = "No adaptation rules apply to this profile."
+        else:
+            key = tuple(canonicalize_rules(outcome))
+            rule_sets.setdefault(key, (outcome, []))[1].append(student_id)
+
+    print(f"[Batch] {len(student_ids)} profile(s) -> {len(rule_sets)} distinct rule set(s) for {lesson_url}")
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def adapt(rules: List[str], students: List[str]) -> RuleSetResult:
+        async with semaphore:
+            try:
+                state = await lesson_from_content_app.ainvoke({
+                    "rules": rules,
+                    "lesson_url": lesson_url,
+                    "lesson_file_path": lesson.lesson_file_path,
+                    "lesson_content": lesson.lesson_content,
+                    "number_of_days": number_of_days,
+                    "file_category": file_category,
+                    "bypass_cache": bypass_cache,
+                    "timings": lesson.timings
+                })
+                return RuleSetResult(students, rules, state, None)
+            except Exception as e:
+                print(f"[Batch] Adaptation failed for {', '.join(students)}: {e}")
+                return RuleSetResult(students, rules, None, str(e))
+
+    results = await asyncio.gather(*(adapt(rules, students) for rules, students in rule_sets.values()))
+    return rule_errors, list(results)
+
+async def adapt_lessons(
+    rules: List[str],
+    lessons: List[LessonSpec],
+    bypass_cache: bool = False,
+    concurrency: int = LESSON_BATCH_CONCURRENCY,
+) -> AsyncIterator[LessonResult]:
+    """
+    Adapts a unit of lessons with one set of rules. Every lesson is fetched
+    and parsed right away; the GPT-4o calls of all lessons (days and
+    worksheet sections) share a limit of `concurrency`. Yields a
+    LessonResult per lesson as soon as it finishes, in completion order.
+    Identical entries (same URL, category and days) are adapted once.
+    """
+    async def run(lesson: LessonSpec) -> Tuple[Optional[dict], Optional[str]]:
+        try:
+            loaded = await load_lesson(lesson.lesson_url)
+            state = await lesson_from_content_app.ainvoke({
+                "rules": rules,
+                "lesson_url": lesson.lesson_url,
+                "lesson_file_path": loaded.lesson_file_path,
+                "lesson_content": loaded.lesson_content,
+                "number_of_days": lesson.number_of_days,
+                "file_category": lesson.file_category,
+                "bypass_cache": bypass_cache,
+                "timings": loaded.timings
+            })
+            return state, None
+        except Exception as e:
+            print(f"[Batch] Lesson {lesson.lesson_url} failed: {e}")
+            return None, str(e)
+
+    async def run_indexed(lesson: LessonSpec, indices: List[int]):
+        return lesson, indices, await run(lesson)
+
+    indices_by_lesson: Dict[LessonSpec, List[int]] = {}
+    for index, lesson in enumerate(lessons):
+        indices_by_lesson.setdefault(lesson, []).append(index)
+
+    # Tasks copy the current context, so all of them see the same limiter
+    token = adaptation_limiter.set(asyncio.Semaphore(max(1, concurrency)))
+    try:
+        tasks = [asyncio.ensure_future(run_indexed(lesson, indices)) for lesson, indices in indices_by_lesson.items()]
+    finally:
+        adaptation_limiter.reset(token)
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            lesson, indices, (state, error) = await next_done
+            for index in indices:
+                yield LessonResult(index, lesson, state, error)
+    finally:
+        # Stop outstanding work if the consumer goes away (e.g. client disconnect)
+        for task in tasks:
+            task.cancel()
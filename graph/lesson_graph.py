@@ -2,23 +2,24 @@
 
 from langgraph.graph import StateGraph
 from graph.schema import State
-from graph.nodes.rule_node import rule_node
-from graph.nodes.download_lesson_node import download_lesson_node
-from graph.nodes.modify_lesson_node import modify_lesson_node
-from graph.nodes.audio_node import audio_node
-from graph.nodes.visual_node import visual_node
-from graph.nodes.final_output_node import final_output_node
+from utils.metrics import instrument_node
+from graph.nodes.rule_node import arule_node
+from graph.nodes.download_lesson_node import adownload_lesson_node
+from graph.nodes.modify_lesson_node import amodify_lesson_node
+from graph.nodes.audio_node import aaudio_node
+from graph.nodes.visual_node import avisual_node
+from graph.nodes.final_output_node import afinal_output_node
 
 # Build the graph
 workflow = StateGraph(State)
 
 # Add all nodes
-workflow.add_node("rule_node", rule_node)
-workflow.add_node("download_lesson_node", download_lesson_node)
-workflow.add_node("modify_lesson_node", modify_lesson_node)
-workflow.add_node("audio_node", audio_node)
-workflow.add_node("visual_node", visual_node)
-workflow.add_node("final_output_node", final_output_node)
+workflow.add_node("rule_node", instrument_node("rule_node", arule_node))
+workflow.add_node("download_lesson_node", instrument_node("download_lesson_node", adownload_lesson_node))
+workflow.add_node("modify_lesson_node", instrument_node("modify_lesson_node", amodify_lesson_node))
+workflow.add_node("audio_node", instrument_node("audio_node", aaudio_node))
+workflow.add_node("visual_node", instrument_node("visual_node", avisual_node))
+workflow.add_node("final_output_node", instrument_node("final_output_node", afinal_output_node))
 
 # Define edges (flow of data)
 workflow.set_entry_point("rule_node")
@@ -0,0 +1,20 @@
+# graph/lesson_graph_from_content.py
+
+from langgraph.graph import StateGraph
+from graph.schema import State
+from utils.metrics import instrument_node
+from graph.nodes.modify_lesson_node import amodify_lesson_node
+from graph.nodes.final_output_node import afinal_output_node
+
+# Adaptation only: rules and lesson_content are already in the input state
+# (used by the batch routes, which download and parse each lesson once)
+workflow = StateGraph(State)
+
+workflow.add_node("modify_lesson_node", instrument_node("modify_lesson_node", amodify_lesson_node))
+workflow.add_node("final_output_node", instrument_node("final_output_node", afinal_output_node))
+
+workflow.set_entry_point("modify_lesson_node")
+workflow.add_edge("modify_lesson_node", "final_output_node")
+workflow.set_finish_point("final_output_node")
+
+lesson_from_content_app = workflow.compile()
@@ -1,7 +1,31 @@
 # graph/nodes/audio_node.py
 
-from tools.audio.generate import split_text_for_audio, generate_audio_for_text_chunks
+from tools.audio.generate import split_text_for_audio_with_offsets, generate_audio_urls_for_chunks
+from typing import List, Optional, Tuple
 import os
+import asyncio
+
+def insert_audio_markers(
+    lesson_text: str,
+    spans: List[Tuple[int, int, str]],
+    audio_urls: List[Optional[str]],
+) -> str:
+    """
+    Builds the lesson with an [AUDIO:filename.mp3] marker after each narrated
+    chunk, in one left-to-right pass over the chunk offsets. Repeated
+    paragraphs each get their own marker at their own position.
+    """
+    parts = []
+    cursor = 0
+    for (start, end, chunk), url in zip(spans, audio_urls):
+        if not url:
+            continue
+        insert_at = start + len(chunk.rstrip())
+        parts.append(lesson_text[cursor:insert_at])
+        parts.append(f"\n\n[AUDIO:{os.path.basename(url)}]")
+        cursor = insert_at
+    parts.append(lesson_text[cursor:])
+    return "".join(parts)
 
 def audio_node(state: dict) -> dict:
     """
@@ -16,14 +40,18 @@ def audio_node(state: dict) -> dict:
         state.update({"audio_paths" : []})
         return state
 
-    chunks = split_text_for_audio(lesson_text)
-    audio_results = generate_audio_for_text_chunks(chunks)
+    spans = split_text_for_audio_with_offsets(lesson_text)
+    audio_urls = generate_audio_urls_for_chunks([chunk for _, _, chunk in spans])
 
     # Insert [AUDIO:filename.mp3] markers inline
-    for path, text in audio_results:
-        filename = os.path.basename(path)
-        lesson_text = lesson_text.replace(text, f"{text}\n\n[AUDIO:{filename}]")
+    lesson_text = insert_audio_markers(lesson_text, spans, audio_urls)
 
     # Update state
-    state.update({"modified_lesson_text" : lesson_text, "audio_paths" : [path for path, _ in audio_results]})
-    return state
\ No newline at end of file
+    state.update({"modified_lesson_text" : lesson_text, "audio_paths" : [url for url in audio_urls if url]})
+    return state
+
+async def aaudio_node(state: dict) -> dict:
+    """
+    Async variant of audio_node; TTS calls are blocking so the node runs in a worker thread.
+    """
+    return await asyncio.to_thread(audio_node, state)
@@ -1,22 +1,23 @@
 # graph/nodes/download_lesson_node.py
 
-from utils.file_utils import download_file
-from utils.file_parser import extract_text_from_file
+import asyncio
+from utils.source_cache import get_lesson_source, extract_text_cached
 
-def download_lesson_node(state: dict) -> dict:
+async def adownload_lesson_node(state: dict) -> dict:
     """
     Downloads the lesson file from URL and extracts its text content.
+    Both steps go through the source cache, so repeat runs on the same lesson are cheap.
+    Download and parsing are blocking, so they run in a worker thread.
     """
     lesson_url = state.get("lesson_url")
     if not lesson_url:
         raise ValueError("Missing lesson_url in state.")
 
-    # ✅ Cast to string to avoid decode error
-    file_path = download_file(str(lesson_url))
-    lesson_content = extract_text_from_file(file_path)
+    file_path, content_hash = await asyncio.to_thread(get_lesson_source, str(lesson_url))
+    lesson_content = await asyncio.to_thread(extract_text_cached, file_path, content_hash)
 
     state.update({
         "lesson_file_path": file_path,
         "lesson_content": lesson_content
     })
-    return state
\ No newline at end of file
+    return state
@@ -1,16 +1,18 @@
+import asyncio
 from tools.output.generate import generate_final_output
 
-def final_output_node(state: dict) -> dict:
+async def afinal_output_node(state: dict) -> dict:
     """
     Creates the final output files (.txt, .json, .md) with just placeholders.
     No audio/image assets are resolved – the output remains editable for user.
+    File writes run in a worker thread.
     """
     lesson_text = state.get("modified_lesson_text", "")
 
     if not lesson_text:
         raise ValueError("Missing modified_lesson_text in state.")
 
-    result = generate_final_output(lesson_text)
+    result = await asyncio.to_thread(generate_final_output, lesson_text)
 
     state.update({
         "final_output_path": result["txt_path"],
@@ -18,4 +20,4 @@ def final_output_node(state: dict) -> dict:
         "final_output_md": result["md_path"]
     })
 
-    return state
\ No newline at end of file
+    return state
@@ -1,35 +1,201 @@
 # graph/nodes/modify_lesson_node.py
 
-from tools.llm.modify import modify_lesson_content, modify_lesson_content_worksheet
+import os
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from langchain_core.callbacks.manager import adispatch_custom_event
+from tools.llm.modify import amodify_lesson_content, amodify_lesson_content_worksheet
+from tools.llm.chunking import plan_chunks, split_worksheet, join_worksheet_sections
 
-def split_text_into_chunks(text: str, n: int) -> list:
+# Max number of day chunks adapted at the same time, and how many extra
+# attempts a failed day gets before the whole lesson is failed.
+DAY_CONCURRENCY = int(os.getenv("MODIFY_DAY_CONCURRENCY", "4"))
+DAY_RETRIES = int(os.getenv("MODIFY_DAY_RETRIES", "2"))
+
+# Set by batch runs (see graph.batch.adapt_lessons) so that all lessons of a
+# batch share one limit on GPT-4o adaptation calls, on top of DAY_CONCURRENCY.
+adaptation_limiter: contextvars.ContextVar = contextvars.ContextVar("adaptation_limiter", default=None)
+
+@asynccontextmanager
+async def adaptation_slot():
+    limiter = adaptation_limiter.get()
+    if limiter is None:
+        yield
+    else:
+        async with limiter:
+            yield
+
+def token_emitter(section, attempt: int = 1):
     """
-    Splits text into n chunks by paragraph, keeping boundaries clean.
+    Returns an on_token callback that publishes each text delta as a "token"
+    custom event, picked up by astream_events (see the /stream routes in main.py).
     """
-    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
-    total = len(paragraphs)
-    chunk_size = total // n
-    remainder = total % n
+    async def on_token(delta: str) -> None:
+        await adispatch_custom_event(
+            "token",
+            {"section": section, "attempt": attempt, "text": delta}
+        )
+    return on_token
 
-    chunks = []
-    start = 0
-    for i in range(n):
-        end = start + chunk_size + (1 if i < remainder else 0)
-        chunks.append("\n\n".join(paragraphs[start:end]))
-        start = end
+def split_text_into_chunks(text: str, n: int) -> list:
+    """
+    Splits text into n day chunks of roughly equal token length, at paragraph
+    boundaries (see tools.llm.chunking.plan_chunks). A day over
+    MODIFY_DAY_TOKEN_BUDGET comes back split into parts.
+    """
+    chunks = plan_chunks(text, n)
+    print(f"[ModifyLesson] Day token loads: {[chunk.tokens for chunk in chunks]}")
+    for i, chunk in enumerate(chunks):
+        if len(chunk.parts) > 1:
+            print(f"[ModifyLesson] Day {i + 1} is over the token budget: adapted in {len(chunk.parts)} parts")
     return chunks
 
-def modify_lesson_node(state: dict) -> dict:
+def split_worksheet_sections(text: str) -> list:
+    sections = split_worksheet(text)
+    print(f"[ModifyLesson] Worksheet section token loads: {[section.tokens for section in sections]}")
+    return sections
+
+async def adapt_days_concurrently(
+    chunks: list,
+    rules: list,
+    concurrency: int = DAY_CONCURRENCY,
+    retries: int = DAY_RETRIES,
+    use_cache: bool = True,
+    stream_tokens: bool = False,
+    label: str = "Day",
+    adapt=None,
+    names: list = None,
+) -> list:
     """
-    Applies adaptation rules to the lesson content using GPT-4o.
-    Splits content by number of days only for 'Lesson' category.
-    - Lesson: split into days with ### Day N headers.
-    - Worksheet: apply full content at once without splitting.
+    Adapts each day chunk concurrently (at most `concurrency` calls in flight).
+    Results come back in day order. Only the days that failed are retried;
+    a RuntimeError is raised if any day still fails after `retries` attempts.
+    With `stream_tokens`, generated text is published as "token" events per day.
+
+    `adapt(index, on_token)` replaces the lesson adaptation call (used for
+    worksheet sections, with label="Section"). `names` overrides the
+    "{label} N" name of each chunk in token events and errors.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    names = names or [f"{label} {i + 1}" for i in range(len(chunks))]
+
+    async def adapt_day(index: int, attempt: int) -> str:
+        on_token = token_emitter(names[index], attempt) if stream_tokens else None
+        async with semaphore, adaptation_slot():
+            if adapt is not None:
+                return await adapt(index, on_token)
+            return await amodify_lesson_content(chunks[index], rules, use_cache=use_cache, on_token=on_token)
+
+    results = [None] * len(chunks)
+    errors = {}
+    pending = list(range(len(chunks)))
+
+    for attempt in range(retries + 1):
+        outcomes = await asyncio.gather(
+            *(adapt_day(i, attempt + 1) for i in pending),
+            return_exceptions=True
+        )
+
+        failed = []
+        for i, outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"[ModifyLesson] {names[i]} failed (attempt {attempt + 1}): {outcome}")
+                errors[i] = outcome
+                failed.append(i)
+            else:
+                results[i] = outcome
+
+        pending = failed
+        if not pending:
+            return results
+
+    details = "; ".join(f"{names[i]}: {errors[i]}" for i in pending)
+    raise RuntimeError(f"{len(pending)} of {len(chunks)} {label.lower()}(s) failed: {details}")
+
+async def adapt_lesson_days(
+    chunks: list,
+    rules: list,
+    use_cache: bool = True,
+    stream_tokens: bool = False,
+) -> list:
+    """
+    Adapts every day of a lesson (Chunks from split_text_into_chunks) and
+    returns the adapted text of each day. The parts of a day over the token
+    budget are adapted as separate calls, alongside the other days, and
+    joined back in order.
+    """
+    pieces = [
+        (day, (number, len(chunk.parts)) if len(chunk.parts) > 1 else None, text)
+        for day, chunk in enumerate(chunks)
+        for number, text in enumerate(chunk.parts, 1)
+    ]
+    names = [
+        f"Day {day + 1}" + (f" (part {part[0]}/{part[1]})" if part else "")
+        for day, part, _ in pieces
+    ]
+
+    async def adapt_piece(index: int, on_token) -> str:
+        _, part, text = pieces[index]
+        return await amodify_lesson_content(text, rules, use_cache=use_cache, on_token=on_token, part=part)
+
+    adapted = await adapt_days_concurrently(
+        [text for _, _, text in pieces],
+        rules,
+        use_cache=use_cache,
+        stream_tokens=stream_tokens,
+        adapt=adapt_piece,
+        names=names
+    )
+
+    days = [[] for _ in chunks]
+    for (day, _, _), text in zip(pieces, adapted):
+        days[day].append(text.strip())
+    return ["\n\n".join(parts) for parts in days]
+
+async def adapt_worksheet_sections(
+    sections: list,
+    rules: list,
+    use_cache: bool = True,
+    stream_tokens: bool = False,
+) -> str:
+    """
+    Map-reduce worksheet adaptation: every section is adapted concurrently
+    (same limits and retries as lesson days), then the results are joined
+    with the original dividers and question numbering.
+    """
+    async def adapt_section(index: int, on_token) -> str:
+        return await amodify_lesson_content_worksheet(
+            sections[index].text,
+            rules,
+            use_cache=use_cache,
+            on_token=on_token,
+            part=(index + 1, len(sections))
+        )
+
+    adapted = await adapt_days_concurrently(
+        sections,
+        rules,
+        use_cache=use_cache,
+        stream_tokens=stream_tokens,
+        label="Section",
+        adapt=adapt_section
+    )
+    return join_worksheet_sections(sections, adapted)
+
+async def amodify_lesson_node(state: dict) -> dict:
+    """
+    Applies adaptation rules to the lesson content using GPT-4o (on AsyncOpenAI).
+    - Lesson: split into days with ### Day N headers, adapted concurrently.
+    - Worksheet: adapted in one call, or for long worksheets section by
+      section (split between questions) and joined back together.
     """
     rules = state.get("rules")
     lesson_content = state.get("lesson_content")
     file_category = state.get("file_category", "Lesson")
     number_of_days = state.get("number_of_days", 1)
+    use_cache = not state.get("bypass_cache", False)
+    stream_tokens = bool(state.get("stream_tokens", False))
 
     if not rules:
         raise ValueError("Missing 'rules' in state.")
@@ -38,23 +204,42 @@ def modify_lesson_node(state: dict) -> dict:
 
     try:
         if file_category.lower() == "worksheet":
-            # No chunking — apply full worksheet adaptation
-            modified = modify_lesson_content_worksheet(lesson_content, rules)
+            sections = await asyncio.to_thread(split_worksheet_sections, lesson_content)
+            if len(sections) <= 1:
+                async with adaptation_slot():
+                    modified = await amodify_lesson_content_worksheet(
+                        lesson_content,
+                        rules,
+                        use_cache=use_cache,
+                        on_token=token_emitter("Worksheet") if stream_tokens else None
+                    )
+            else:
+                modified = await adapt_worksheet_sections(
+                    sections,
+                    rules,
+                    use_cache=use_cache,
+                    stream_tokens=stream_tokens
+                )
             final_text = modified.strip()
 
         else:
-            # For 'Lesson', split into N days and adapt each
-            chunks = split_text_into_chunks(lesson_content, number_of_days)
-            modified_sections = []
-
-            for i, chunk in enumerate(chunks):
-                modified = modify_lesson_content(chunk, rules)
-                modified_sections.append(f"### Day {i + 1}\n\n{modified.strip()}")
+            # Token counting is CPU work (and may load the tokenizer): keep it off the event loop
+            chunks = await asyncio.to_thread(split_text_into_chunks, lesson_content, number_of_days)
+            modified_days = await adapt_lesson_days(
+                chunks,
+                rules,
+                use_cache=use_cache,
+                stream_tokens=stream_tokens
+            )
 
+            modified_sections = [
+                f"### Day {i + 1}\n\n{modified.strip()}"
+                for i, modified in enumerate(modified_days)
+            ]
             final_text = "\n\n".join(modified_sections)
 
     except Exception as e:
         raise RuntimeError(f"Failed to modify lesson: {str(e)}")
 
     state.update({"modified_lesson_text": final_text})
-    return state
\ No newline at end of file
+    return state
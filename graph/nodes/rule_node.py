@@ -1,8 +1,8 @@
 # graph/nodes/rule_node.py
 
-from agents.rule_agent import generate_cleaned_rules
+from agents.rule_agent import agenerate_cleaned_rules
 
-def rule_node(state: dict) -> dict:
+async def arule_node(state: dict) -> dict:
     """
     LangGraph node to extract and filter adaptation rules based on student profile.
     Adds 'rules' to the state for downstream nodes.
@@ -10,8 +10,8 @@ def rule_node(state: dict) -> dict:
     profile = state.get("student_profile")
     if not profile:
         raise ValueError("Missing 'student_profile' in state.")
-    
-    cleaned_rules = generate_cleaned_rules(profile)
+
+    cleaned_rules = await agenerate_cleaned_rules(profile)
     state.update({"rules" : cleaned_rules})
 
     return state
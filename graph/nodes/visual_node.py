@@ -1,20 +1,13 @@
-from tools.visuals.fetch import get_image_urls_from_serpapi, download_images
-from openai import OpenAI
-import os, ast, re
+from tools.visuals.fetch import get_image_urls_for_queries, download_images
+from openai import AsyncOpenAI
+from utils.llm_usage import openai_call, prompt_parts
+import os, ast, re, asyncio
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
-def extract_image_queries(text: str, rules: list) -> list:
-    """
-    Use LLM to suggest what image topics should be added to the lesson.
-    """
-    print("[VisualNode] Extracting image queries...")  
-    if not any("visual" in rule.lower() for rule in rules):
-        print("no Visuals rule found")
-        return []
-
-    prompt = f"""
+def build_image_query_prompt(text: str, rules: list) -> str:
+    return f"""
 You are an assistant that helps make lesson plans more visual and engaging.
 
 Lesson:
@@ -27,14 +20,31 @@ Extract 3–5 short and searchable visual topics that would help illustrate this
 
 Visual Suggestions:
 """
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.5,
-        timeout=30
-    )
-
-    raw = response.choices[0].message.content.strip()
+
+async def aextract_image_queries(text: str, rules: list) -> list:
+    """
+    Use LLM to suggest what image topics should be added to the lesson.
+    """
+    print("[VisualNode] Extracting image queries...")
+    if not any("visual" in rule.lower() for rule in rules):
+        print("no Visuals rule found")
+        return []
+
+    messages = [{"role": "user", "content": build_image_query_prompt(text, rules)}]
+    parts = prompt_parts(messages, lesson_text=len(text), rules=len(str(rules)))
+    with openai_call("visual_node.image_queries", "gpt-4o", parts) as call:
+        response = await async_client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.5,
+            timeout=30
+        )
+        call.usage = response.usage
+
+    return parse_image_queries(response.choices[0].message.content)
+
+def parse_image_queries(raw: str) -> list:
+    raw = raw.strip()
     print("raw:", raw)  # debugging
 
     # --- Clean raw output ---
@@ -57,21 +67,24 @@ Visual Suggestions:
         print("[VisualNode] Failed to eval raw:", raw, "Error:", e)
         return []
 
-def visual_node(state: dict) -> dict:
+async def avisual_node(state: dict) -> dict:
+    """
+    Finds images for the lesson and fills its [Insert Image: ...] placeholders.
+    SerpAPI and downloads run in worker threads.
+    """
     text = state.get("modified_lesson_text", "")
     rules = state.get("rules", [])
 
     if not text or not rules:
-        state.update({"image_paths": []})  # ensure key exists
+        state.update({"image_paths": []})
         return state
 
-    # 1. Extract image queries from lesson
-    queries = extract_image_queries(text, rules)
+    queries = await aextract_image_queries(text, rules)
+
+    search_results = await asyncio.to_thread(get_image_urls_for_queries, queries, 1)
 
-    # 2. Clean and download images for each query
     image_urls = []
-    for query in queries:
-        urls = get_image_urls_from_serpapi(query, count=1)
+    for query, urls in zip(queries, search_results):
         if not urls:
             print(f"[VisualNode] No images found for query: {query}")
             continue
@@ -79,12 +92,22 @@ def visual_node(state: dict) -> dict:
 
     if not image_urls:
         print("[VisualNode] No valid image URLs to download.")
-        state.update({"image_paths": []})  # ✅ fix
+        state.update({"image_paths": []})
         return state
 
-    image_paths = download_images(image_urls)
+    image_paths = await asyncio.to_thread(download_images, image_urls)
 
-    # 3. Replace placeholders using a COPY of image_paths
+    state.update({
+        "modified_lesson_text": insert_image_placeholders(text, image_paths),
+        "image_paths": image_paths
+    })
+    return state
+
+def insert_image_placeholders(text: str, image_paths: list) -> str:
+    """
+    Fills [Insert Image: ...] placeholders with downloaded images, appending any extras.
+    """
+    # Replace placeholders using a COPY of image_paths
     image_paths_copy = image_paths.copy()
 
     def replacement(match, filenames=image_paths_copy):
@@ -98,15 +121,10 @@ def visual_node(state: dict) -> dict:
     pattern = r"\[Insert Image:.*?\]"
     text = re.sub(pattern, replacement, text)
 
-    # 4. Append extras if leftover in copy (not original)
+    # Append extras if leftover in copy (not original)
     for path in image_paths_copy:
         filename = os.path.basename(path)
         if filename not in text:
             text += f"\n\n[IMAGE:{filename}]"
 
-    # 5. Update state
-    state.update({
-        "modified_lesson_text": text,
-        "image_paths": image_paths
-    })
-    return state
\ No newline at end of file
+    return text
\ No newline at end of file
@@ -19,11 +19,15 @@ class State(BaseModel):
 
     file_category: Optional[str] = "Lesson"   # e.g., "Lesson" or "Worksheet"
     number_of_days: Optional[int] = 1 
+    bypass_cache: Optional[bool] = False      # skip cached LLM adaptations and regenerate
+    stream_tokens: Optional[bool] = False     # publish GPT-4o text deltas as "token" stream events
 
     final_output_path: Optional[str] = None   # path to final .txt file
     final_output_json: Optional[str] = None  # path to final .json file for structured display
     final_output_md: Optional[str] = None    # ✅ path to final .md file
 
+    timings: Optional[Dict[str, dict]] = None  # per-node wall time, outbound calls and bytes written
+
     def get(self, key, default=None):
         """
         Mimic dict-like get() for pipeline nodes.
@@ -2,21 +2,29 @@
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, HttpUrl
 from typing import Dict, List, Union, Optional
-from bs4 import BeautifulSoup
-import html2text
 import os
 import uuid
 import shutil
+import asyncio
+import json
 
 from tools.llm.student_map_updater import update_rule_file_based_on_feedback
 from tools.audio.generate import generate_audio_file
 from tools.visuals.fetch import get_image_urls_from_serpapi, download_images
+from tools.output.generate import materialize_output
+from tools.output.html_to_markdown import editor_html_to_markdown
 from graph.lesson_placeholder_graph import lesson_placeholders_app
 from graph.lesson_graph_from_rules import lesson_from_rules_app
+from graph.batch import adapt_for_profiles, adapt_lessons, LessonSpec
+from utils.http_client import close_http_client
+from utils.job_queue import JobQueue, JobWorkerPool, QueueFull
+from utils.output_store import output_store, safe_name
+from utils.metrics import render_prometheus, record_bytes_written
+from utils.llm_usage import usage_ledger, usage_scope
 
 app = FastAPI(title="Lesson Modifier API - Placeholder Based")
 
@@ -29,18 +37,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("shutdown")
+def shutdown_http_client():
+    close_http_client()
+
+# ===== Output Store GC =====
+OUTPUT_GC_INTERVAL = float(os.getenv("OUTPUT_GC_INTERVAL_SECONDS", str(6 * 3600)))
+output_gc_task: Optional[asyncio.Task] = None
+
+async def run_output_gc():
+    while True:
+        try:
+            stats = await asyncio.to_thread(output_store.collect_garbage)
+            freed = sum(s["freed_bytes"] for s in stats.values())
+            deleted = sum(s["deleted"] for s in stats.values())
+            print(f"[OutputStore] GC removed {deleted} files ({freed / (1024 * 1024):.1f} MB)")
+        except Exception as e:
+            print(f"[OutputStore] GC failed: {e}")
+        try:
+            pruned = await asyncio.to_thread(job_queue.prune, JOB_RETENTION_DAYS * 24 * 3600)
+            if pruned:
+                print(f"[Jobs] Pruned {pruned} finished jobs older than {JOB_RETENTION_DAYS:g} days")
+        except Exception as e:
+            print(f"[Jobs] Pruning failed: {e}")
+        await asyncio.sleep(OUTPUT_GC_INTERVAL)
+
+@app.on_event("startup")
+async def start_output_gc():
+    global output_gc_task
+    if OUTPUT_GC_INTERVAL > 0:
+        output_gc_task = asyncio.create_task(run_output_gc())
+
+@app.on_event("shutdown")
+async def stop_output_gc():
+    if output_gc_task is not None:
+        output_gc_task.cancel()
+        await asyncio.gather(output_gc_task, return_exceptions=True)
+
+# ===== Background Jobs =====
+job_queue = JobQueue(max_queued=int(os.getenv("JOB_QUEUE_MAX", "500")))
+# Finished jobs (and their results) are pruned by the output GC task after this long
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+job_workers: Optional[JobWorkerPool] = None
+
+@app.on_event("startup")
+async def start_job_workers():
+    global job_workers
+    job_workers = JobWorkerPool(
+        job_queue,
+        handlers={
+            "full_pipeline": run_full_pipeline_job,
+            "lesson_from_rules": run_lesson_from_rules_job,
+        },
+        workers=int(os.getenv("JOB_WORKERS", "2")),
+    )
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    if job_workers is not None:
+        await job_workers.stop()
+
 # ===== Request Models =====
 class FullPipelineRequest(BaseModel):
     student_profile: Dict[str, Union[str, List[str]]]
     lesson_url: HttpUrl
     file_category: Optional[str] = "Lesson"        # e.g., "Lesson" or "Worksheet"
     number_of_days: Optional[int] = 1    
+    bypass_cache: Optional[bool] = False   # regenerate instead of reusing a cached adaptation
 
 class ShortPipelineRequest(BaseModel):
     rules: List[str]
     lesson_url: HttpUrl
     file_category: Optional[str] = "Lesson"        # e.g., "Lesson" or "Worksheet"
     number_of_days: Optional[int] = 1   
+    bypass_cache: Optional[bool] = False
+
+class ClassPipelineRequest(BaseModel):
+    lesson_url: HttpUrl
+    student_profiles: Dict[str, Dict[str, Union[str, List[str]]]]   # student id -> profile
+    file_category: Optional[str] = "Lesson"
+    number_of_days: Optional[int] = 1
+    bypass_cache: Optional[bool] = False
+
+class LessonBatchItem(BaseModel):
+    lesson_url: HttpUrl
+    file_category: Optional[str] = "Lesson"
+    number_of_days: Optional[int] = 1
+
+class LessonBatchRequest(BaseModel):
+    rules: List[str]
+    lessons: List[LessonBatchItem]
+    bypass_cache: Optional[bool] = False
 
 class ModifyLessonRequest(BaseModel):
     rules: List[str]
@@ -56,42 +144,244 @@ class RuleUpdateRequest(BaseModel):
 class RuleUpdateResponse(BaseModel):
     updated_rule_file: List[str]
 
+# ===== Pipeline Helpers =====
+PIPELINE_NODES = {"rule_node", "download_lesson_node", "modify_lesson_node", "final_output_node"}
+
+def pipeline_inputs(request: Union[FullPipelineRequest, ShortPipelineRequest], stream_tokens: bool = False) -> dict:
+    """
+    Graph inputs for a /full-pipeline or /lesson_from_rules request (blocking,
+    streamed or queued as a job). Optional fields sent as null get their defaults.
+    """
+    if isinstance(request, FullPipelineRequest):
+        inputs = {"student_profile": request.student_profile}
+    else:
+        inputs = {"rules": request.rules}
+    inputs.update({
+        "lesson_url": str(request.lesson_url),
+        "number_of_days": request.number_of_days or 1,
+        "file_category": request.file_category or "Lesson",
+        "bypass_cache": bool(request.bypass_cache)
+    })
+    if stream_tokens:
+        inputs["stream_tokens"] = True
+    return inputs
+
+def build_output_urls(result) -> dict:
+    """
+    Public URLs for the files written by final_output_node.
+    """
+    md_file = os.path.basename(result.get("final_output_md"))
+    json_file = os.path.basename(result.get("final_output_json"))
+    txt_file = os.path.basename(result.get("final_output_path"))
+
+    return {
+        "final_output_md": f"https://langgraph-lesson-modifier.onrender.com/markdown/{md_file}",
+        "final_output_json": f"https://langgraph-lesson-modifier.onrender.com/json/{json_file}",
+        "final_output_path": f"https://langgraph-lesson-modifier.onrender.com/files/{txt_file}",
+        "editor_url": f"https://langgraph-lesson-modifier.onrender.com/editor/index.html?file={md_file}"
+    }
+
+def build_timings(result) -> dict:
+    """
+    Per-node timings collected by utils.metrics.instrument_node.
+    """
+    nodes = result.get("timings") or {}
+    return {
+        "total_seconds": round(sum(node["wall_seconds"] for node in nodes.values()), 4),
+        "nodes": nodes
+    }
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_pipeline(graph, inputs: dict, include_rules: bool, endpoint: str):
+    """
+    Runs a compiled graph with astream_events and re-emits its progress as SSE.
+    """
+    with usage_scope(endpoint):
+        async for event in _stream_pipeline_events(graph, inputs, include_rules):
+            yield event
+
+async def _stream_pipeline_events(graph, inputs: dict, include_rules: bool):
+    yield sse_event("start", {"lesson_url": inputs["lesson_url"]})
+    final_state = None
+    try:
+        async for event in graph.astream_events(inputs, version="v2"):
+            kind = event["event"]
+            name = event.get("name")
+
+            if kind == "on_custom_event" and name == "token":
+                yield sse_event("token", event["data"])
+            elif name in PIPELINE_NODES and event.get("metadata", {}).get("langgraph_node") == name:
+                if kind == "on_chain_start":
+                    yield sse_event("node_start", {"node": name})
+                elif kind == "on_chain_end":
+                    yield sse_event("node_end", {"node": name})
+                    if name == "final_output_node":
+                        final_state = event["data"].get("output")
+
+        if final_state is None:
+            raise RuntimeError("Pipeline finished without final output.")
+
+        payload = {**build_output_urls(final_state), "timings": build_timings(final_state)}
+        if include_rules:
+            payload = {"rules": final_state.get("rules", []), **payload}
+        yield sse_event("complete", payload)
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Pipeline failed: {str(e)}"})
+
+async def run_pipeline_job(graph, inputs: dict, report_progress, include_rules: bool, endpoint: str) -> dict:
+    """
+    Runs a graph for a background job, recording each finished node as progress.
+    """
+    completed = []
+    final_state = None
+    with usage_scope(endpoint):
+        async for mode, chunk in graph.astream(inputs, stream_mode=["updates", "values"]):
+            if mode == "updates":
+                completed.extend(node for node in chunk if node in PIPELINE_NODES)
+                await report_progress({"completed_nodes": completed})
+            else:
+                final_state = chunk
+
+    if final_state is None:
+        raise RuntimeError("Pipeline finished without final output.")
+
+    payload = {**build_output_urls(final_state), "timings": build_timings(final_state)}
+    if include_rules:
+        payload = {"rules": final_state.get("rules", []), **payload}
+    return payload
+
+# Job payloads are the submitted request bodies; they are validated again so
+# graph inputs get the same defaults as the blocking endpoints.
+async def run_full_pipeline_job(payload: dict, report_progress) -> dict:
+    inputs = pipeline_inputs(FullPipelineRequest(**payload))
+    return await run_pipeline_job(lesson_placeholders_app, inputs, report_progress, include_rules=True,
+                                  endpoint="job full_pipeline")
+
+async def run_lesson_from_rules_job(payload: dict, report_progress) -> dict:
+    inputs = pipeline_inputs(ShortPipelineRequest(**payload))
+    return await run_pipeline_job(lesson_from_rules_app, inputs, report_progress, include_rules=False,
+                                  endpoint="job lesson_from_rules")
+
+async def submit_job(kind: str, request: BaseModel) -> dict:
+    try:
+        # SQLite write (may wait on the database lock): keep it off the event loop
+        job_id = await asyncio.to_thread(job_queue.submit, kind, request.model_dump(mode="json"))
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    if job_workers is not None:
+        job_workers.notify()
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"https://langgraph-lesson-modifier.onrender.com/jobs/{job_id}"
+    }
+
 # ===== Root Route =====
 @app.get("/")
 def root():
     return {"message": "Lesson Modifier API is running 🚀 (Placeholder Mode)"}
 
+# ===== Metrics (Prometheus scrape target) =====
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# ===== OpenAI token usage since start-up, per call site and per endpoint =====
+@app.get("/usage")
+def usage():
+    return usage_ledger.snapshot()
+
 # ===== Full Pipeline: Placeholder only =====
 @app.post("/full-pipeline")
 async def full_pipeline(request: FullPipelineRequest):
     try:
-        result = lesson_placeholders_app.invoke({
-            "student_profile": request.student_profile,
-            "lesson_url": str(request.lesson_url),
-            "number_of_days": request.number_of_days,              
-            "file_category": str(request.file_category)
-        })
-
-        md_file = os.path.basename(result["final_output_md"])
-        json_file = os.path.basename(result["final_output_json"])
-        txt_file = os.path.basename(result["final_output_path"])
-
-        return {
-            "rules": result.get("rules", []),
-            "final_output_md": f"https://langgraph-lesson-modifier.onrender.com/markdown/{md_file}",
-            "final_output_json": f"https://langgraph-lesson-modifier.onrender.com/json/{json_file}",
-            "final_output_path": f"https://langgraph-lesson-modifier.onrender.com/files/{txt_file}",
-            "editor_url": f"https://langgraph-lesson-modifier.onrender.com/editor/index.html?file={md_file}"
-        }
+        with usage_scope("POST /full-pipeline"):
+            result = await lesson_placeholders_app.ainvoke(pipeline_inputs(request))
+
+        return {"rules": result.get("rules", []), **build_output_urls(result), "timings": build_timings(result)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Full pipeline failed: {str(e)}")
 
+@app.post("/full-pipeline/batch")
+async def full_pipeline_batch(request: ClassPipelineRequest):
+    """
+    /full-pipeline for a whole class: one lesson, one profile per student.
+    The lesson is downloaded once and students whose profiles yield the same
+    rules share one adaptation. Returns per-student output URLs (or an error).
+    """
+    if not request.student_profiles:
+        raise HTTPException(status_code=400, detail="student_profiles is empty.")
+    try:
+        with usage_scope("POST /full-pipeline/batch"):
+            rule_errors, rule_sets = await adapt_for_profiles(
+                str(request.lesson_url),
+                request.student_profiles,
+                number_of_days=request.number_of_days or 1,
+                file_category=request.file_category or "Lesson",
+                bypass_cache=bool(request.bypass_cache)
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch pipeline failed: {str(e)}")
+
+    students = {student_id: {"error": error} for student_id, error in rule_errors.items()}
+    for index, rule_set in enumerate(rule_sets):
+        if rule_set.state is None:
+            result = {"error": f"Adaptation failed: {rule_set.error}"}
+        else:
+            result = {**build_output_urls(rule_set.state), "timings": build_timings(rule_set.state)}
+        for student_id in rule_set.students:
+            students[student_id] = {"rule_set": index, "rules": rule_set.rules, **result}
+
+    return {
+        "lesson_url": str(request.lesson_url),
+        "distinct_rule_sets": len(rule_sets),
+        "students": {student_id: students[student_id] for student_id in request.student_profiles}
+    }
+
+@app.post("/full-pipeline/stream")
+async def full_pipeline_stream(request: FullPipelineRequest):
+    """
+    Same as /full-pipeline, but answers immediately with Server-Sent Events:
+    node_start / node_end per graph node, token events with GPT-4o text per
+    day section, then a final "complete" (or "error") event with the output URLs.
+    """
+    inputs = pipeline_inputs(request, stream_tokens=True)
+    return sse_response(stream_pipeline(lesson_placeholders_app, inputs, include_rules=True,
+                                        endpoint="POST /full-pipeline/stream"))
+
+
+# ===== Background Job Variants =====
+@app.post("/jobs/full-pipeline", status_code=202)
+async def submit_full_pipeline_job(request: FullPipelineRequest):
+    return await submit_job("full_pipeline", request)
+
+@app.post("/jobs/lesson_from_rules", status_code=202)
+async def submit_lesson_from_rules_job(request: ShortPipelineRequest):
+    return await submit_job("lesson_from_rules", request)
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 
 # ===== Update rules on Feedback =====
 @app.post("/update-rule-file", response_model=RuleUpdateResponse)
 async def update_rule_file(request: RuleUpdateRequest):
     try:
-        updated_rules = update_rule_file_based_on_feedback(request.rule_file, request.feedback)
+        with usage_scope("POST /update-rule-file"):
+            updated_rules = await asyncio.to_thread(update_rule_file_based_on_feedback, request.rule_file, request.feedback)
         return {"updated_rule_file": updated_rules}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -100,34 +390,70 @@ async def update_rule_file(request: RuleUpdateRequest):
 @app.post("/lesson_from_rules")
 async def generate_lesson_from_existing_rules(request: ShortPipelineRequest):
     try:
-        result = lesson_from_rules_app.invoke({
-            "rules": request.rules,
-            "lesson_url": str(request.lesson_url),
-            "number_of_days": request.number_of_days,              
-            "file_category": str(request.file_category)
-        })
-
-        md_file = os.path.basename(result["final_output_md"])
-        json_file = os.path.basename(result["final_output_json"])
-        txt_file = os.path.basename(result["final_output_path"])
-
-        return {
-            "final_output_md": f"https://langgraph-lesson-modifier.onrender.com/markdown/{md_file}",
-            "final_output_json": f"https://langgraph-lesson-modifier.onrender.com/json/{json_file}",
-            "final_output_path": f"https://langgraph-lesson-modifier.onrender.com/files/{txt_file}",
-            "editor_url": f"https://langgraph-lesson-modifier.onrender.com/editor/index.html?file={md_file}"
-        }
+        with usage_scope("POST /lesson_from_rules"):
+            result = await lesson_from_rules_app.ainvoke(pipeline_inputs(request))
+
+        return {**build_output_urls(result), "timings": build_timings(result)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lesson from rules pipeline failed: {str(e)}")
+
+@app.post("/lesson_from_rules/stream")
+async def lesson_from_rules_stream(request: ShortPipelineRequest):
+    """
+    Server-Sent Events variant of /lesson_from_rules (see /full-pipeline/stream).
+    """
+    inputs = pipeline_inputs(request, stream_tokens=True)
+    return sse_response(stream_pipeline(lesson_from_rules_app, inputs, include_rules=False,
+                                        endpoint="POST /lesson_from_rules/stream"))
     
 
 
+async def stream_lesson_batch(request: LessonBatchRequest):
+    """
+    Runs graph.batch.adapt_lessons and reports each lesson as SSE when it finishes.
+    """
+    lessons = [
+        LessonSpec(str(item.lesson_url), item.file_category or "Lesson", item.number_of_days or 1)
+        for item in request.lessons
+    ]
+    yield sse_event("start", {"lessons": len(lessons)})
+    succeeded = failed = 0
+    with usage_scope("POST /lesson_from_rules/batch"):
+        async for result in adapt_lessons(request.rules, lessons, bypass_cache=bool(request.bypass_cache)):
+            lesson = {"index": result.index, "lesson_url": result.lesson.lesson_url}
+            if result.state is None:
+                failed += 1
+                yield sse_event("lesson_error", {**lesson, "detail": f"Lesson failed: {result.error}"})
+            else:
+                succeeded += 1
+                yield sse_event("lesson_complete", {
+                    **lesson,
+                    **build_output_urls(result.state),
+                    "timings": build_timings(result.state)
+                })
+    yield sse_event("complete", {"succeeded": succeeded, "failed": failed})
+
+@app.post("/lesson_from_rules/batch")
+async def lesson_from_rules_batch(request: LessonBatchRequest):
+    """
+    /lesson_from_rules for a unit of lessons sharing one rules list. Answers
+    with Server-Sent Events: "start", then "lesson_complete" (output URLs)
+    or "lesson_error" per lesson in the order they finish, each carrying the
+    lesson's index in the request, then "complete" with the counts.
+    """
+    if not request.rules:
+        raise HTTPException(status_code=400, detail="rules is empty.")
+    if not request.lessons:
+        raise HTTPException(status_code=400, detail="lessons is empty.")
+    return sse_response(stream_lesson_batch(request))
+
+
 # ===== Image Search for Placeholder Replacement =====
 @app.get("/api/search_images")
 async def search_images(q: str = Query(...)):
     try:
-        urls = get_image_urls_from_serpapi(q, count=5)
-        return download_images(urls)
+        urls = await asyncio.to_thread(get_image_urls_from_serpapi, q, 5)
+        return await asyncio.to_thread(download_images, urls)
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
     
@@ -136,7 +462,7 @@ async def search_images(q: str = Query(...)):
 @app.post("/api/generate_audio")
 async def generate_audio(request: GenerateAudioRequest):
     try:
-        path = generate_audio_file(request.prompt)
+        path = await asyncio.to_thread(generate_audio_file, request.prompt)
         filename = os.path.basename(path)
         return {"audio_url": f"https://langgraph-lesson-modifier.onrender.com/audio/{filename}"}
     except Exception as e:
@@ -146,84 +472,86 @@ async def generate_audio(request: GenerateAudioRequest):
 @app.post("/api/upload_audio")
 async def upload_audio(file: UploadFile = File(...)):
     try:
-        out_path = f"data/outputs/audio/{uuid.uuid4().hex}_{file.filename}"
+        out_path = output_store.path("audio", f"{uuid.uuid4().hex}_{safe_name(file.filename or 'audio')}")
         with open(out_path, "wb") as out_file:
             shutil.copyfileobj(file.file, out_file)
+        record_bytes_written("upload", os.path.getsize(out_path))
         filename = os.path.basename(out_path)
         return {"audio_url": f"https://langgraph-lesson-modifier.onrender.com/audio/{filename}"}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
-# ===== Upload Image =====
+# ===== Save Edited Lesson =====
+def save_editor_markdown(filename: str, html: str) -> str:
+    markdown = editor_html_to_markdown(html)
+    file_path = output_store.path("saved", filename)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(markdown)
+    record_bytes_written("saved_markdown", os.path.getsize(file_path))
+    # Audio/images linked from the saved lesson are kept by the output store GC
+    output_store.record_references("saved", filename, markdown)
+    return file_path
+
 @app.post("/api/save_markdown")  # ← This adds the route
 async def save_markdown(request: Request):
-    print("Received request to /api/save_markdown")
     try:
-        print("i am here 1")
         data = await request.json()
-        print("🔍 Incoming request body:", data)
-
         html = data.get("markdown", "")
-        print("📝 Extracted HTML:", html if html else "[EMPTY]")
-
         user_id = data.get("user_id", "anon")
-        print("👤 Extracted User ID:", user_id)
-
-        # Step 1: Clean HTML
-        soup = BeautifulSoup(html, "html.parser")
-        for tag in soup.find_all(True):
-            for attr in ["style", "class", "contenteditable", "data-type", "data-id"]:
-                tag.attrs.pop(attr, None)
-
-        # Step 2: Replace <audio> with proper markdown links
-        for audio in soup.find_all("audio"):
-            source_tag = audio.find("source")
-            if source_tag and source_tag.has_attr("src"):
-                audio_url = source_tag["src"]
-                placeholder = f"[AUDIO: {audio_url}]"
-            else:
-                placeholder = "[AUDIO]"
-            audio.replace_with(f"\n\n{placeholder}\n\n")
-
-        # Step 3: Replace [IMAGE: ...] placeholders
-        for span in soup.find_all("span"):
-            text = span.get_text(strip=True)
-            if "[IMAGE:" in text:
-                cleaned = text.split("✎")[0].strip()
-                span.replace_with(f"\n\n{cleaned}\n\n")
-
-        # Step 4: Convert to Markdown
-        cleaned_html = str(soup)
-
-        converter = html2text.HTML2Text()
-        converter.body_width = 0                # ✅ Disable auto line breaks
-        converter.ignore_links = False
-        converter.ignore_images = False
-        converter.ignore_emphasis = False
-        converter.protect_links = True          # ✅ Keeps full URLs safe
-        markdown = converter.handle(cleaned_html)
-
-        # Step 5: Save file
-        filename = f"{user_id}_{uuid.uuid4().hex}.md"
-        save_dir = "data/outputs/markdown"
-        os.makedirs(save_dir, exist_ok=True)
-        file_path = os.path.join(save_dir, filename)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(markdown)
+        print(f"[SaveMarkdown] user={user_id} html={len(html)} chars")
+
+        # Conversion and write are CPU/disk bound: keep them off the event loop
+        filename = safe_name(f"{user_id}_{uuid.uuid4().hex}.md")
+        await asyncio.to_thread(save_editor_markdown, filename, html)
 
         file_url = f"https://langgraph-lesson-modifier.onrender.com/markdown/{filename}"
         print(file_url)
         return {"url": file_url}
 
     except Exception as e:
-        print("i am here 2")
         print("Error in /api/save_markdown:", str(e))
         return {"error": str(e)}
 
+# ===== Output File Routes =====
+# Files live in the sharded output store; public URLs keep the bare filename.
+# Serving a file restarts its retention period.
+def stored_file(category: str, filename: str) -> FileResponse:
+    path = output_store.resolve(category, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    output_store.touch(path)
+    return FileResponse(path)
+
+@app.get("/markdown/{filename}")
+async def get_markdown(filename: str):
+    # Editor saves first; otherwise a pipeline lesson, rendered from its .txt on first request
+    path = output_store.resolve("saved", filename)
+    if path is None:
+        path = await asyncio.to_thread(materialize_output, filename)
+    if path is None:
+        return stored_file("markdown", filename)
+    output_store.touch(path)
+    return FileResponse(path)
+
+@app.get("/json/{filename}")
+async def get_json(filename: str):
+    path = await asyncio.to_thread(materialize_output, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    output_store.touch(path)
+    return FileResponse(path)
+
+@app.get("/files/{filename}")
+async def get_lesson_text(filename: str):
+    return stored_file("final", filename)
+
+@app.get("/audio/{filename}")
+async def get_audio(filename: str):
+    return stored_file("audio", filename)
+
+@app.get("/images/{filename}")
+async def get_image(filename: str):
+    return stored_file("images", filename)
+
 # ===== Static File Routes =====
-app.mount("/files", StaticFiles(directory="data/outputs/final"), name="files")
-app.mount("/json", StaticFiles(directory="data/outputs/json"), name="json")
-app.mount("/markdown", StaticFiles(directory="data/outputs/markdown"), name="markdown")
-app.mount("/audio", StaticFiles(directory="data/outputs/audio"), name="audio")
-app.mount("/images", StaticFiles(directory="data/outputs/images"), name="images")
 app.mount("/editor", StaticFiles(directory="editor"), name="editor")
\ No newline at end of file
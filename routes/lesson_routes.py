@@ -4,6 +4,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import HttpUrl
 from typing import Dict, Union, List
 from graph.lesson_graph import lesson_app
+from utils.llm_usage import usage_scope
 
 router = APIRouter()
 
@@ -20,7 +21,8 @@ async def modify_lesson(
         }
 
         # Run the LangGraph lesson modifier
-        result = lesson_app.invoke(inputs)
+        with usage_scope("POST /modify-lesson/"):
+            result = await lesson_app.ainvoke(inputs)
 
         return {
             "modified_lesson": result.get("modified_lesson"),
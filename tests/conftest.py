@@ -0,0 +1,14 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The OpenAI clients are created at import time; tests stub them before any call
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+# Caches and outputs are written under ./data: keep test runs out of the checkout
+os.chdir(tempfile.mkdtemp(prefix="lesson_modifier_tests_"))
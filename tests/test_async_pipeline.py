@@ -0,0 +1,75 @@
+# tests/test_async_pipeline.py
+
+import time
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import tools.llm.modify as modify
+from graph.lesson_graph_from_content import lesson_from_content_app
+
+DELAY = 0.5
+
+class FakeCompletions:
+    """
+    Stands in for AsyncOpenAI's chat.completions: every call takes DELAY seconds.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        message = SimpleNamespace(content=f"Adapted lesson {self.calls}.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+@pytest.fixture
+def completions(monkeypatch):
+    fake = FakeCompletions(DELAY)
+    monkeypatch.setattr(modify, "async_client", SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+    return fake
+
+def lesson_inputs(index: int, number_of_days: int = 1) -> dict:
+    return {
+        "rules": ["Use simple sentences."],
+        "lesson_url": f"https://example.com/lesson_{index}.pdf",
+        "lesson_content": "\n\n".join(f"Lesson {index}, paragraph {p}." for p in range(number_of_days * 3)),
+        "number_of_days": number_of_days,
+        "file_category": "Lesson",
+        "bypass_cache": True,
+    }
+
+async def run_concurrently(inputs: list) -> tuple:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(lesson_from_content_app.ainvoke(state) for state in inputs))
+    return results, time.perf_counter() - start
+
+def test_concurrent_runs_take_about_one_run(completions):
+    runs = 8
+    results, elapsed = asyncio.run(run_concurrently([lesson_inputs(i) for i in range(runs)]))
+
+    assert completions.calls == runs
+    assert completions.max_in_flight == runs
+    # Sequential runs would take runs * DELAY
+    assert elapsed < 2 * DELAY
+    for result in results:
+        assert result.get("modified_lesson_text").startswith("### Day 1\n\nAdapted lesson")
+        assert result.get("final_output_path").endswith(".txt")
+
+def test_days_of_one_lesson_are_adapted_concurrently(completions):
+    results, elapsed = asyncio.run(run_concurrently([lesson_inputs(0, number_of_days=3)]))
+
+    assert completions.calls == 3
+    assert elapsed < 2 * DELAY
+    text = results[0].get("modified_lesson_text")
+    assert [line for line in text.splitlines() if line.startswith("###")] == ["### Day 1", "### Day 2", "### Day 3"]
@@ -0,0 +1,63 @@
+# tests/test_audio.py
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import tools.audio.generate as audio
+from utils.output_store import OutputStore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = OutputStore(root=str(tmp_path), db_path=str(tmp_path / "refs.sqlite3"))
+    monkeypatch.setattr(audio, "output_store", store)
+    return store
+
+def fake_tts(monkeypatch, create):
+    monkeypatch.setattr(audio, "client", SimpleNamespace(audio=SimpleNamespace(speech=SimpleNamespace(create=create))))
+
+def test_failed_synthesis_cleans_up(store, monkeypatch):
+    class Response:
+        def stream_to_file(self, path):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise ConnectionError("stream dropped")
+
+    fake_tts(monkeypatch, lambda **kwargs: Response())
+
+    with pytest.raises(ConnectionError):
+        audio.synthesize_cached("Hello there.")
+
+    assert audio._synthesis_locks == {}
+    leftovers = [name for _, _, names in os.walk(store.root) for name in names if name.endswith(".part")]
+    assert leftovers == []
+    assert store.resolve("audio", audio.audio_filename("Hello there.")) is None
+
+def test_concurrent_synthesis_shares_one_call(store, monkeypatch):
+    calls = []
+
+    class Response:
+        def stream_to_file(self, path):
+            time.sleep(0.05)
+            with open(path, "wb") as f:
+                f.write(b"mp3")
+
+    def create(**kwargs):
+        calls.append(kwargs["input"])
+        return Response()
+
+    fake_tts(monkeypatch, create)
+
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(audio.synthesize_cached("Same text."))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["Same text."]
+    assert len(set(paths)) == 1
+    assert audio._synthesis_locks == {}
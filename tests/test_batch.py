@@ -0,0 +1,38 @@
+# tests/test_batch.py
+
+import asyncio
+
+import graph.batch as batch
+from graph.schema import State
+
+def test_rule_generation_is_bounded(monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def fake_rules(profile):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [f"Use {profile['language']}."]
+
+    async def fake_load(lesson_url):
+        return State(lesson_url=lesson_url, lesson_file_path="lesson.pdf", lesson_content="Text.", timings={})
+
+    class FakeApp:
+        async def ainvoke(self, inputs):
+            return {"rules": inputs["rules"]}
+
+    monkeypatch.setattr(batch, "agenerate_cleaned_rules", fake_rules)
+    monkeypatch.setattr(batch, "load_lesson", fake_load)
+    monkeypatch.setattr(batch, "lesson_from_content_app", FakeApp())
+
+    profiles = {f"s{i}": {"language": "Spanish" if i % 2 else "Arabic"} for i in range(40)}
+    rule_errors, results = asyncio.run(
+        batch.adapt_for_profiles("https://example.com/lesson.pdf", profiles, rule_concurrency=5)
+    )
+
+    assert peak == 5
+    assert rule_errors == {}
+    assert sorted(len(result.students) for result in results) == [20, 20]
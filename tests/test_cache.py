@@ -0,0 +1,53 @@
+# tests/test_cache.py
+
+import os
+
+import utils.cache as cache
+from utils.cache import ResponseCache
+
+def make_cache(tmp_path, monkeypatch, **kwargs) -> ResponseCache:
+    monkeypatch.setattr(cache, "CACHE_ROOT", str(tmp_path))
+    return ResponseCache("test", **kwargs)
+
+def test_overwrite_does_not_double_count_disk_bytes(tmp_path, monkeypatch):
+    store = make_cache(tmp_path, monkeypatch)
+    store.set("aa1", "x" * 100)
+    store.set("bb2", "y" * 10)
+    for _ in range(5):
+        store.set("aa1", "z" * 50)
+
+    assert store.stats()["disk_bytes"] == store._scan_disk_bytes()
+    assert store.get("aa1") == "z" * 50
+
+def test_failed_write_leaves_no_temp_file(tmp_path, monkeypatch):
+    store = make_cache(tmp_path, monkeypatch)
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cache.os, "replace", failing_replace)
+    store.set("cc3", {"value": 1})
+
+    leftovers = [name for _, _, files in os.walk(tmp_path) for name in files]
+    assert leftovers == []
+    # Still served from memory
+    assert store.get("cc3") == {"value": 1}
+
+def test_stats_are_exported_as_metrics(tmp_path, monkeypatch):
+    import tools.llm.modify  # noqa: F401 (registers adaptations)
+    import agents.rule_agent  # noqa: F401 (registers rule_filter)
+    from utils.metrics import render_prometheus
+
+    store = make_cache(tmp_path, monkeypatch)
+    store.get("dd4")
+    store.set("dd4", "x" * 10)
+    store.get("dd4")
+
+    lines = render_prometheus().splitlines()
+    assert 'lesson_cache_hits_total{cache="test"} 1' in lines
+    assert 'lesson_cache_misses_total{cache="test"} 1' in lines
+    assert 'lesson_cache_memory_items{cache="test"} 1' in lines
+    assert f'lesson_cache_disk_bytes{{cache="test"}} {store._scan_disk_bytes()}' in lines
+    assert "# TYPE lesson_cache_hits_total counter" in lines
+    for name in ("adaptations", "rule_filter"):
+        assert any(line.startswith(f'lesson_cache_disk_hits_total{{cache="{name}"}} ') for line in lines)
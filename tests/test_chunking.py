@@ -0,0 +1,115 @@
+# tests/test_chunking.py
+
+import random
+import asyncio
+
+import pytest
+
+import graph.nodes.modify_lesson_node as modify_lesson_node
+from tools.llm.chunking import PIECES_PER_LIMIT, plan_chunks, split_into_blocks, is_heading
+from utils.tokenizer import count_tokens
+
+def words(text: str) -> list:
+    return text.split()
+
+def sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(["the", "boy", "flew", "over", "sea", "wax", "sun", "wings"]) for _ in range(length)) + "."
+
+def make_lesson(rng: random.Random, paragraphs: int) -> str:
+    parts = []
+    for index in range(paragraphs):
+        if rng.random() < 0.2:
+            parts.append(f"Chapter {index}")
+        parts.append(" ".join(sentence(rng, rng.randint(3, 15)) for _ in range(rng.randint(1, 8))))
+    return "\n\n".join(parts)
+
+@pytest.mark.parametrize("seed", range(50))
+def test_no_content_is_lost(seed):
+    rng = random.Random(seed)
+    text = make_lesson(rng, rng.randint(1, 40))
+    n = rng.randint(1, 6)
+    budget = rng.choice([0, 80, 400])
+
+    chunks = plan_chunks(text, n, budget)
+
+    assert len(chunks) == n
+    assert words(" ".join(chunk.text for chunk in chunks)) == words(text)
+    for chunk in chunks:
+        assert words(" ".join(chunk.parts)) == words(chunk.text)
+
+def test_loads_are_balanced_around_one_huge_paragraph():
+    rng = random.Random(7)
+    huge = " ".join(sentence(rng, 10) for _ in range(300))
+    tiny = [sentence(rng, 4) for _ in range(60)]
+    text = "\n\n".join(tiny[:30] + [huge] + tiny[30:])
+    n = 4
+
+    chunks = plan_chunks(text, n, budget=0)
+
+    loads = [chunk.tokens for chunk in chunks]
+    share = sum(loads) / n
+    # The huge paragraph is broken at sentence ends into pieces of about
+    # share / PIECES_PER_LIMIT, so no day is off by more than one piece
+    slack = share / PIECES_PER_LIMIT
+    assert max(loads) <= share + slack
+    assert min(loads) >= share - slack
+    assert words(" ".join(chunk.text for chunk in chunks)) == words(text)
+
+def test_headings_stay_with_the_following_paragraph():
+    rng = random.Random(3)
+    sections = []
+    for index in range(12):
+        sections.append(f"## Part {index}")
+        sections.append(" ".join(sentence(rng, 8) for _ in range(rng.randint(2, 6))))
+    text = "\n\n".join(sections)
+
+    for n in range(2, 8):
+        for chunk in plan_chunks(text, n, budget=0):
+            paragraphs = [p for p in chunk.text.split("\n\n") if p]
+            assert not is_heading(paragraphs[-1])
+            assert not chunk.text.startswith(tuple(s for s in sections if not s.startswith("##")))
+
+def test_short_untitled_line_counts_as_heading():
+    blocks = split_into_blocks("The Flight of Icarus\n\nDaedalus built wings.\n\nThey flew.")
+    assert blocks[0].text == "The Flight of Icarus\n\nDaedalus built wings."
+
+def test_over_budget_day_is_split_into_parts_under_budget():
+    rng = random.Random(11)
+    text = "\n\n".join(" ".join(sentence(rng, 10) for _ in range(5)) for _ in range(40))
+    budget = 500
+    assert count_tokens(text) > 3 * budget
+
+    (chunk,) = plan_chunks(text, 1, budget)
+
+    assert len(chunk.parts) >= -(-chunk.tokens // budget)
+    assert all(count_tokens(part) <= budget for part in chunk.parts)
+    assert words(" ".join(chunk.parts)) == words(text)
+
+def test_day_within_budget_is_one_part():
+    text = "Daedalus built wings.\n\nIcarus flew too close to the sun."
+    (chunk,) = plan_chunks(text, 1, budget=500)
+    assert chunk.parts == [chunk.text]
+
+def test_empty_days_when_text_is_too_short():
+    chunks = plan_chunks("One line.", 3)
+    assert [chunk.text for chunk in chunks] == ["One line.", "", ""]
+
+def test_over_budget_day_is_adapted_as_several_calls(monkeypatch):
+    rng = random.Random(5)
+    text = "\n\n".join(" ".join(sentence(rng, 10) for _ in range(5)) for _ in range(30))
+    chunks = plan_chunks(text, 2, budget=300)
+    assert all(len(chunk.parts) > 1 for chunk in chunks)
+
+    calls = []
+
+    async def fake_modify(text, rules, use_cache=True, on_token=None, part=None):
+        calls.append(part)
+        return f"<{part[0]}/{part[1]}>"
+
+    monkeypatch.setattr(modify_lesson_node, "amodify_lesson_content", fake_modify)
+    days = asyncio.run(modify_lesson_node.adapt_lesson_days(chunks, ["rule"]))
+
+    assert len(calls) == sum(len(chunk.parts) for chunk in chunks)
+    for chunk, day in zip(chunks, days):
+        total = len(chunk.parts)
+        assert day == "\n\n".join(f"<{number}/{total}>" for number in range(1, total + 1))
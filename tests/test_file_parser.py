@@ -0,0 +1,64 @@
+# tests/test_file_parser.py
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+import pytest
+
+import utils.file_parser as file_parser
+
+EMPTY_PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+    b"2 0 obj << /Type /Pages /Kids [] /Count 0 >> endobj\n"
+    b"trailer << /Root 1 0 R >>\n"
+    b"%%EOF\n"
+)
+
+def make_pdf(path, pages: int) -> str:
+    pdf = fitz.open()
+    for index in range(pages):
+        pdf.new_page().insert_text((72, 72), f"Page {index} text")
+    pdf.save(str(path))
+    pdf.close()
+    return str(path)
+
+def broken_pool() -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    with pytest.raises(Exception):
+        pool.submit(os._exit, 1).result()
+    return pool
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    yield
+    if file_parser._pool is not None:
+        file_parser._pool.shutdown()
+        file_parser._pool = None
+
+def test_parallel_extraction_keeps_page_order(tmp_path):
+    path = make_pdf(tmp_path / "lesson.pdf", 12)
+    text = file_parser.extract_text_from_pdf(path, parallel=True)
+    assert text == file_parser.extract_text_from_pdf(path, parallel=False)
+    assert text.index("Page 2 text") < text.index("Page 11 text")
+
+def test_broken_pool_is_replaced(tmp_path):
+    path = make_pdf(tmp_path / "lesson.pdf", 6)
+    broken = broken_pool()
+    file_parser._pool = broken
+
+    text = file_parser.extract_text_from_pdf(path, parallel=True)
+
+    assert "Page 5 text" in text
+    assert file_parser._pool is not None and file_parser._pool is not broken
+
+def test_pdf_without_pages_is_extracted_serially(tmp_path):
+    path = tmp_path / "empty.pdf"
+    path.write_bytes(EMPTY_PDF)
+    with fitz.open(str(path)) as pdf:
+        assert pdf.page_count == 0
+
+    assert file_parser.extract_text_from_pdf(str(path), parallel=True) == ""
+    assert file_parser._pool is None
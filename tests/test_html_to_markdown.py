@@ -0,0 +1,46 @@
+# tests/test_html_to_markdown.py
+#
+# EditorMarkdownConverter hooks into html2text's parser callbacks, so an
+# html2text upgrade can change its output. These cases pin it to the legacy
+# BeautifulSoup clean-up + html2text pipeline it replaced.
+
+import pytest
+
+from benchmarks.bench_html_to_markdown import legacy_convert, make_document
+from tools.output.html_to_markdown import editor_html_to_markdown
+
+CASES = {
+    "editor_document": make_document(5),
+    "entities": "<p>Fish &amp; chips &lt;b&gt; &quot;quoted&quot; caf&eacute; &nbsp; &#169; &#x263A; &bogus; 5 &lt 6</p>",
+    "audio_without_source": '<p>Listen:</p><audio controls class="fixed-media"></audio><p>Done.</p>',
+    "audio_with_two_sources": (
+        '<audio><source src="https://x.test/audio/a.mp3" type="audio/mpeg">'
+        '<source src="https://x.test/audio/b.ogg"></audio>'
+    ),
+    "image_span_without_edit_control": '<p><span class="placeholder">[IMAGE: photo.webp]</span> after</p>',
+    "nested_image_span": '<p><span><b>[IMAGE: a.webp]</b> ✎ <i>edit</i></span></p>',
+    "plain_span": '<p><span style="color: red">Red <em>text</em></span> stays.</p>',
+    "lists_and_quotes": (
+        "<ol><li>First</li><li>Second<ul><li>Nested</li></ul></li></ol>"
+        "<blockquote><p>Quoted line</p></blockquote><hr><pre>code  block\n  indented</pre>"
+    ),
+    "table": "<table><tr><th>Word</th><th>Translation</th></tr><tr><td>wings</td><td>alas</td></tr></table>",
+    "links_and_images": (
+        '<p><a href="https://example.org/a?b=1&amp;c=2">link</a> '
+        '<img src="https://x.test/images/i.webp" alt="alt text"></p>'
+    ),
+    "headings_and_breaks": "<h1>Title</h1><h2>Part 1</h2><p>Line one<br>Line two</p><h3>1. Question</h3>",
+    "unicode_text": "<p>Ícaro voló (flew) — ¿por qué? 伊卡洛斯 🌞</p>",
+    # Malformed markup, as BeautifulSoup repairs it
+    "unclosed_bold": "<p>unclosed <b>bold",
+    "unclosed_nested_emphasis": "<p>x <i>it <b>both",
+    "unclosed_image_span": "<p>a <span>[IMAGE: q.webp] ✎ <b>edit",
+    "stray_end_tags": "<p>x</b> y</p></br>z",
+    "misnested_emphasis": "<p><b><i>x</b>y</p>",
+    "stray_end_tag_inside_image_span": "<span>a &amp; b </br>[IMAGE: z.webp] ✎ [IMAGE: y.webp]</span>",
+}
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_matches_legacy_pipeline(name):
+    html = CASES[name]
+    assert editor_html_to_markdown(html) == legacy_convert(html)
@@ -0,0 +1,120 @@
+# tests/test_job_queue.py
+
+import time
+import asyncio
+import sqlite3
+
+from utils.job_queue import JobQueue, JobWorkerPool
+
+def set_running(db_path: str, job_id: str, attempts: int, lease_until) -> None:
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'running', attempts = ?, lease_until = ? WHERE id = ?",
+            (attempts, lease_until, job_id)
+        )
+    conn.close()
+
+def test_expired_jobs_are_requeued_until_max_attempts(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(db_path, max_attempts=3)
+    retried = queue.submit("full_pipeline", {"n": 1})
+    exhausted = queue.submit("full_pipeline", {"n": 2})
+    set_running(db_path, retried, 2, time.time() - 1)
+    set_running(db_path, exhausted, 3, None)   # rows from before leases count as expired
+
+    assert queue.claim_next()["id"] == retried
+    failed = queue.get(exhausted)
+    assert failed["status"] == "failed"
+    assert "interrupted 3 time(s)" in failed["error"]
+    assert queue.claim_next() is None
+
+def test_running_jobs_of_another_process_are_left_alone(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    first = JobQueue(db_path, lease_seconds=60)
+    job_id = first.submit("full_pipeline", {})
+    assert first.claim_next()["id"] == job_id
+
+    second = JobQueue(db_path, lease_seconds=60)   # e.g. another uvicorn worker starting
+
+    assert second.claim_next() is None
+    assert second.get(job_id)["status"] == "running"
+
+def test_running_jobs_renew_their_lease(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.15)
+    job_id = queue.submit("slow", {})
+    other = JobQueue(queue.db_path, lease_seconds=0.15)
+    stolen = []
+
+    async def handler(payload, report_progress):
+        for _ in range(6):
+            await asyncio.sleep(0.1)
+            stolen.append(await asyncio.to_thread(other.claim_next))
+        return {"ok": True}
+
+    run_pool(queue, {"slow": handler}, lambda: queue.get(job_id)["status"] == "succeeded")
+
+    assert stolen == [None] * 6
+    job = queue.get(job_id)
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 1
+
+def test_prune_deletes_only_old_finished_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    succeeded = queue.submit("full_pipeline", {})
+    failed = queue.submit("full_pipeline", {})
+    waiting = queue.submit("full_pipeline", {})
+    queue.finish(succeeded, {"ok": True})
+    queue.finish(failed, error="boom")
+
+    assert queue.prune(3600) == 0
+    assert queue.prune(3600, now=time.time() + 7200) == 2
+    assert queue.get(succeeded) is None
+    assert queue.get(failed) is None
+    assert queue.get(waiting)["status"] == "queued"
+
+def run_pool(queue: JobQueue, handlers: dict, until, timeout: float = 5.0) -> None:
+    async def main():
+        pool = JobWorkerPool(queue, handlers, workers=1, poll_interval=0.01)
+        pool.start()
+        try:
+            deadline = time.time() + timeout
+            while not until() and time.time() < deadline:
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+    asyncio.run(main())
+
+def test_unserializable_result_fails_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit("odd", {})
+
+    async def handler(payload, report_progress):
+        return {"value": object()}
+
+    run_pool(queue, {"odd": handler}, lambda: queue.get(job_id)["status"] not in ("queued", "running"))
+
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Could not store job result")
+
+def test_worker_survives_claim_errors(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit("ok", {})
+    claim_next = queue.claim_next
+    failures = [sqlite3.OperationalError("database is locked")] * 2
+
+    def flaky_claim():
+        if failures:
+            raise failures.pop()
+        return claim_next()
+
+    monkeypatch.setattr(queue, "claim_next", flaky_claim)
+
+    async def handler(payload, report_progress):
+        return {"ok": True}
+
+    run_pool(queue, {"ok": handler}, lambda: queue.get(job_id)["status"] == "succeeded")
+
+    assert queue.get(job_id)["status"] == "succeeded"
+    assert queue.get(job_id)["result"] == {"ok": True}
@@ -0,0 +1,126 @@
+# tests/test_output_rendering.py
+#
+# Pins the .txt / .md / .json views of a final lesson. The expected strings
+# are what the original generate_final_output wrote for the same lesson; the
+# block-stream renderers must keep producing them byte for byte.
+
+import os
+
+import pytest
+
+import tools.output.generate as generate
+from utils.output_store import OutputStore
+
+LESSON = (
+    "Title: Día 1 — Les fruits 🍎\n"
+    "\n"
+    "Reading Instructions\n"
+    "Read the text aloud, then answer.\n"
+    "[AUDIO:audio_0123.mp3]\n"
+    "\n"
+    "\n"
+    "\n"
+    "  Vocabulary:  \n"
+    "la pomme = apple · 苹果\n"
+    "[IMAGE:image_abcd.webp]\n"
+    "[Insert Image: a basket of apples]\n"
+    "Listen first: [Insert Audio: \"Bonjour\" slowly ]\n"
+    "1. Qu'est-ce que c'est ?\r\n"
+    "2. Where is the [Insert Image: pear]\n"
+    "\n"
+    "End.\n"
+)
+
+EXPECTED_MD = (
+    "# Día 1 — Les fruits 🍎\n\n\n\n"
+    "## Reading Instructions\n\n"
+    "Read the text aloud, then answer.\n\n"
+    "[AUDIO:audio_0123.mp3]\n\n\n\n\n\n\n\n"
+    "**Vocabulary:**\n\n"
+    "la pomme = apple · 苹果\n\n"
+    "[IMAGE:image_abcd.webp]\n\n"
+    "🔍 [Insert Image: a basket of apples]\n\n"
+    "🔊 [Insert Audio: \"Bonjour\" slowly]\n\n"
+    "### 1. Qu'est-ce que c'est ?\n\n"
+    "### 2. Where is the [Insert Image: pear]\n\n\n\n"
+    "End."
+)
+
+EXPECTED_JSON = """[
+  {
+    "type": "text",
+    "content": "Title: Día 1 — Les fruits 🍎"
+  },
+  {
+    "type": "text",
+    "content": "Reading Instructions"
+  },
+  {
+    "type": "text",
+    "content": "Read the text aloud, then answer."
+  },
+  {
+    "type": "text",
+    "content": "[AUDIO:audio_0123.mp3]"
+  },
+  {
+    "type": "text",
+    "content": "Vocabulary:"
+  },
+  {
+    "type": "text",
+    "content": "la pomme = apple · 苹果"
+  },
+  {
+    "type": "text",
+    "content": "[IMAGE:image_abcd.webp]"
+  },
+  {
+    "type": "image",
+    "placeholder": "a basket of apples"
+  },
+  {
+    "type": "audio",
+    "placeholder": "\\"Bonjour\\" slowly"
+  },
+  {
+    "type": "text",
+    "content": "1. Qu'est-ce que c'est ?"
+  },
+  {
+    "type": "image",
+    "placeholder": "pear"
+  },
+  {
+    "type": "text",
+    "content": "End."
+  }
+]"""
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = OutputStore(root=str(tmp_path), db_path=str(tmp_path / "refs.sqlite3"))
+    monkeypatch.setattr(generate, "output_store", store)
+    return store
+
+def test_render_markdown_matches_baseline():
+    assert generate.render_markdown(generate.tokenize_lesson(LESSON)) == EXPECTED_MD
+
+def test_render_json_matches_baseline():
+    assert generate.render_json(generate.tokenize_lesson(LESSON)) == EXPECTED_JSON
+
+@pytest.mark.parametrize("lesson, md", [("", ""), ("\n\n", "\n\n"), ("   \n", "")])
+def test_empty_lessons(lesson, md):
+    blocks = generate.tokenize_lesson(lesson)
+    assert generate.render_markdown(blocks) == md
+    assert generate.render_json(blocks) == "[]"
+
+def test_written_files_match_baseline(store):
+    result = generate.generate_final_output(LESSON)
+    with open(result["txt_path"], "rb") as f:
+        assert f.read() == LESSON.encode("utf-8")
+
+    for path, expected in ((result["md_path"], EXPECTED_MD), (result["json_path"], EXPECTED_JSON)):
+        rendered = generate.materialize_output(os.path.basename(path))
+        with open(rendered, "rb") as f:
+            assert f.read() == expected.encode("utf-8")
@@ -0,0 +1,55 @@
+# tests/test_output_store.py
+
+import os
+import sqlite3
+
+import pytest
+
+import utils.output_store as output_store_module
+import tools.output.generate as generate
+from utils.output_store import OutputStore
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = OutputStore(root=str(tmp_path), db_path=str(tmp_path / "refs.sqlite3"))
+    monkeypatch.setattr(generate, "output_store", store)
+    return store
+
+def test_connections_are_closed(store, monkeypatch):
+    opened = []
+    connect = sqlite3.connect
+
+    def tracking_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(output_store_module.sqlite3, "connect", tracking_connect)
+    store.record_references("final", "final_lesson_x.txt", "[AUDIO:a.mp3] [IMAGE:b.webp]")
+    store.collect_garbage()
+
+    assert opened
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+def test_references_are_committed(store):
+    store.record_references("final", "final_lesson_x.txt", "[AUDIO:a.mp3]")
+    conn = sqlite3.connect(store.db_path)
+    try:
+        assert conn.execute("SELECT owner, target FROM refs").fetchall() == [("final/final_lesson_x.txt", "audio/a.mp3")]
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize("extension", ["md", "json"])
+def test_lazy_outputs_restart_retention_on_read(store, extension):
+    result = generate.generate_final_output("# Title\n\nSome text.")
+    filename = os.path.basename(result["txt_path"]).replace(".txt", f".{extension}")
+    rendered = generate.materialize_output(filename)
+    long_ago = 1_000_000_000
+    for path in (result["txt_path"], rendered):
+        os.utime(path, (long_ago, long_ago))
+
+    assert generate.materialize_output(filename) == rendered
+    assert os.path.getmtime(rendered) > long_ago
+    assert os.path.getmtime(result["txt_path"]) > long_ago
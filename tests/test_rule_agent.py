@@ -0,0 +1,72 @@
+# tests/test_rule_agent.py
+
+import os
+import json
+import asyncio
+from types import SimpleNamespace
+
+import agents.rule_agent as rule_agent
+import utils.cache as cache
+from agents.knowledge_base import get_knowledge_base
+from utils.cache import ResponseCache
+
+def write_knowledge_base(path, rule_base: dict, mtime: float) -> None:
+    with open(path, "w") as f:
+        json.dump(rule_base, f)
+    os.utime(path, (mtime, mtime))
+
+def test_knowledge_base_reloads_when_the_file_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "knowledge_base.json")
+    profile = {"language": "Spanish"}
+    write_knowledge_base(path, {"language": {"Spanish": ["Add Spanish translations."]}}, 1_000_000)
+    monkeypatch.setattr(rule_agent, "KNOWLEDGE_BASE_PATH", path)
+
+    first = get_knowledge_base(path)
+    key = rule_agent.filter_cache_key(["Add Spanish translations."])
+    assert get_knowledge_base(path) is first
+    assert rule_agent.extract_rules_from_knowledge_base(profile) == ["Add Spanish translations."]
+
+    write_knowledge_base(path, {"language": {"Spanish": ["Add Spanish audio.", "Add Spanish translations."]}}, 1_000_010)
+
+    second = get_knowledge_base(path)
+    assert second is not first
+    assert second.version != first.version
+    assert rule_agent.extract_rules_from_knowledge_base(profile) == ["Add Spanish audio.", "Add Spanish translations."]
+    # Filter results cached against the old knowledge base are not reused
+    assert rule_agent.filter_cache_key(["Add Spanish translations."]) != key
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        message = SimpleNamespace(content='["Add Spanish translations."]')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+def test_concurrent_filters_for_the_same_rules_share_one_call(tmp_path, monkeypatch):
+    path = str(tmp_path / "knowledge_base.json")
+    write_knowledge_base(path, {"language": {"Spanish": ["Add Spanish translations."]}}, 1_000_000)
+    monkeypatch.setattr(rule_agent, "KNOWLEDGE_BASE_PATH", path)
+    monkeypatch.setattr(cache, "CACHE_ROOT", str(tmp_path / "cache"))
+    monkeypatch.setattr(rule_agent, "rule_filter_cache", ResponseCache("rule_filter"))
+    fake = FakeCompletions()
+    monkeypatch.setattr(rule_agent, "async_client", SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+
+    async def run():
+        # Same canonical rule set: order and duplicates differ
+        return await asyncio.gather(
+            rule_agent.afilter_rules_with_llm(["Student likes music.", "Add Spanish translations."]),
+            rule_agent.afilter_rules_with_llm(["Add Spanish translations.", "Student likes music.", "Student likes music."]),
+        )
+
+    first, second = asyncio.run(run())
+
+    assert fake.calls == 1
+    assert first == second == ["Add Spanish translations."]
+    assert rule_agent._inflight_filters == {}
+
+    again = asyncio.run(rule_agent.afilter_rules_with_llm(["Add Spanish translations.", "Student likes music."]))
+    assert again == first
+    assert fake.calls == 1
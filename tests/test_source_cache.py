@@ -0,0 +1,44 @@
+# tests/test_source_cache.py
+
+import time
+import threading
+
+import utils.source_cache as source_cache
+
+def test_url_lock_serializes_one_url_and_is_released():
+    active = 0
+    peak = 0
+    counter_lock = threading.Lock()
+
+    def worker():
+        nonlocal active, peak
+        with source_cache._url_lock("https://example.com/a.pdf"):
+            with counter_lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with counter_lock:
+                active -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 1
+    assert source_cache._url_locks == {}
+
+def test_url_locks_do_not_accumulate():
+    for index in range(100):
+        with source_cache._url_lock(f"https://example.com/{index}.pdf"):
+            assert len(source_cache._url_locks) == 1
+    assert source_cache._url_locks == {}
+
+def test_url_lock_entry_is_dropped_after_an_error():
+    try:
+        with source_cache._url_lock("https://example.com/broken.pdf"):
+            raise ValueError("download failed")
+    except ValueError:
+        pass
+    assert source_cache._url_locks == {}
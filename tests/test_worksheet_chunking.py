@@ -0,0 +1,113 @@
+# tests/test_worksheet_chunking.py
+
+import random
+import re
+
+import pytest
+
+from tools.llm.chunking import (
+    QUESTION_RE,
+    join_worksheet_sections,
+    restore_question_numbers,
+    split_worksheet,
+)
+from utils.tokenizer import count_tokens
+
+WORDS = ["the", "boy", "flew", "over", "sea", "wax", "sun", "wings", "choose", "answer"]
+
+def make_worksheet(rng: random.Random, questions: int) -> str:
+    parts = ["Name: ________  Date: ______", "Instructions: answer every question."]
+    for number in range(1, questions + 1):
+        if rng.random() < 0.1:
+            parts.append(f"PART {number}")
+        if rng.random() < 0.1:
+            parts.append("-----")
+        question = f"{number}. " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 120))) + "?"
+        options = [f"{letter}) {rng.choice(WORDS)} {rng.choice(WORDS)}" for letter in "abcd"[:rng.randint(0, 4)]]
+        parts.append("\n".join([question] + options))
+    return "\n\n".join(parts)
+
+def question_blocks(text: str) -> list:
+    """Each question's text (number line plus its answer options), whitespace-normalized."""
+    return [" ".join(block.split()) for block in re.findall(r"(?ms)^\d+\. .*?(?=^\d+\. |^PART |^-----|\Z)", text)]
+
+def largest_item(text: str) -> int:
+    """Tokens in the largest unit split_worksheet never breaks: a question with the heading above it."""
+    items = re.findall(r"(?ms)^(?:PART \d+\s+)?\d+\. .*?(?=^PART |^\d+\. |^-----|\Z)", text)
+    return max(count_tokens(item.strip()) for item in items)
+
+@pytest.mark.parametrize("seed", range(30))
+def test_sections_respect_token_budget(seed):
+    rng = random.Random(seed)
+    text = make_worksheet(rng, rng.randint(1, 60))
+    target = rng.choice([50, 150, 600])
+
+    sections = split_worksheet(text, target)
+
+    for section in sections:
+        assert section.tokens <= max(target, largest_item(text))
+    # Fewest sections: no two neighbours would have fit in one
+    for first, second in zip(sections, sections[1:]):
+        assert first.tokens + second.tokens > target
+
+@pytest.mark.parametrize("seed", range(30))
+def test_no_question_is_split_across_sections(seed):
+    rng = random.Random(seed)
+    text = make_worksheet(rng, rng.randint(1, 60))
+
+    sections = split_worksheet(text, rng.choice([50, 150]))
+
+    original = question_blocks(text)
+    split = [block for section in sections for block in question_blocks(section.text)]
+    assert split == original
+    assert [number for section in sections for number in section.numbers] == list(range(1, len(original) + 1))
+
+def test_small_worksheet_is_one_section():
+    text = "Instructions: circle the answer.\n\n1. Two plus two?\na) 3\nb) 4\n\n2. Sky colour?"
+
+    sections = split_worksheet(text, 600)
+
+    assert len(sections) == 1
+    assert sections[0].numbers == [1, 2]
+
+def test_numbering_is_continuous_after_join_when_model_restarts_at_one():
+    text = "\n\n".join(f"{number}. " + "word " * 40 + "?" for number in range(1, 9))
+    sections = split_worksheet(text, 100)
+    assert len(sections) > 1
+
+    # The model renumbers every section from 1, keeping each section's questions
+    adapted = []
+    for section in sections:
+        lines = [f"{i}. Simpler question {i}?" for i in range(1, len(section.numbers) + 1)]
+        adapted.append("\n\n".join(lines))
+
+    joined = join_worksheet_sections(sections, adapted)
+
+    numbers = [int(match.group("number")) for match in map(QUESTION_RE.match, joined.split("\n")) if match]
+    assert numbers == list(range(1, 9))
+
+def test_dividers_are_kept_between_sections():
+    text = "\n\n".join(
+        f"{number}. " + "word " * 40 + "?" + ("\n\n-----" if number == 4 else "")
+        for number in range(1, 9)
+    )
+    sections = split_worksheet(text, 200)
+
+    joined = join_worksheet_sections(sections, [section.text for section in sections])
+
+    assert joined.count("-----") == 1
+    assert " ".join(joined.split()) == " ".join(text.split())
+
+@pytest.mark.parametrize("adapted, numbers, expected", [
+    # Restarted at 1: original numbers come back, with each line's own formatting
+    ("1. A?\nb) yes\n**2.** B?\nQ3: C?", [5, 6, 7], "5. A?\nb) yes\n**6.** B?\nQ7: C?"),
+    # Already right
+    ("5. A?\n6. B?", [5, 6], "5. A?\n6. B?"),
+    # Model dropped or merged a question: left alone
+    ("1. A?", [5, 6], "1. A?"),
+    # Some other numbering: left alone
+    ("2. A?\n3. B?", [5, 6], "2. A?\n3. B?"),
+    ("No questions here.", [], "No questions here."),
+])
+def test_restore_question_numbers(adapted, numbers, expected):
+    assert restore_question_numbers(adapted, numbers) == expected
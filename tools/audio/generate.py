@@ -1,70 +1,139 @@
 # tools/audio/generate.py
 
 import os
-import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
-from typing import List, Tuple
+from typing import Dict, List, Tuple, Optional
+from utils.output_store import output_store
+from utils.metrics import track_call, record_bytes_written, in_current_context
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
-OUTPUT_DIR = "data/outputs/audio"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+TTS_MODEL = "gpt-4o-mini-tts"  # or "tts-1-hd" for better quality
+TTS_VOICE = "sage"             # or "shimmer", "onyx", "coral", etc.
+# Max simultaneous TTS requests when narrating a whole lesson.
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
 
-def split_text_for_audio(text: str) -> List[str]:
+# filename -> [lock, number of threads holding or waiting for it]; an entry
+# is dropped when its last user leaves (same scheme as utils.source_cache).
+_synthesis_locks: Dict[str, List] = {}
+_synthesis_locks_guard = threading.Lock()
+
+def split_text_for_audio_with_offsets(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Splits text into paragraph chunks for TTS narration, keeping where each
+    chunk sits in `text`. Returns (start, end, chunk) with text[start:end] == chunk.
+    """
+    spans = []
+    start = 0
+    for chunk in text.split("\n\n"):
+        end = start + len(chunk)
+        spans.append((start, end, chunk))
+        start = end + 2
+    return spans
+
+def audio_filename(text: str, model: str = TTS_MODEL, voice: str = TTS_VOICE) -> str:
     """
-    Basic heuristic to split text into chunks for TTS narration.
-    You can later improve this with NLP or LLM.
+    Content-addressed MP3 name for (text, model, voice); the file doubles as the TTS cache.
     """
-    return text.split("\n\n")  # Split by paragraph
+    digest = hashlib.sha256(f"{model}\0{voice}\0{text.strip()}".encode("utf-8")).hexdigest()
+    return f"audio_{digest[:32]}.mp3"
 
-def generate_audio_for_text_chunks(chunks: List[str]) -> List[Tuple[str, str]]:
+@contextmanager
+def _synthesis_lock(filename: str):
+    with _synthesis_locks_guard:
+        entry = _synthesis_locks.setdefault(filename, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _synthesis_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _synthesis_locks[filename]
+
+def synthesize_cached(text: str, model: str = TTS_MODEL, voice: str = TTS_VOICE) -> str:
     """
-    Converts each text chunk into an audio file.
-    Returns list of (audio_path, audio_caption).
+    Returns the local path of the narration for `text`, calling the TTS API
+    only if that exact (text, model, voice) has never been synthesized.
     """
-    audio_results = []
+    filename = audio_filename(text, model, voice)
+    audio_path = output_store.resolve("audio", filename)
+    if audio_path:
+        output_store.touch(audio_path)  # reused narration starts a new retention period
+        return audio_path
 
-    for idx, chunk in enumerate(chunks):
-        if not chunk.strip():
-            continue  # Skip empty parts
+    # Concurrent requests for the same narration share one synthesis
+    with _synthesis_lock(filename):
+        audio_path = output_store.resolve("audio", filename)
+        if audio_path:
+            return audio_path
 
+        audio_path = output_store.path("audio", filename)
+        tmp_path = output_store.temp_path("audio")
         try:
-            filename = f"audio_{uuid.uuid4().hex}.mp3"
-            audio_path = os.path.join(OUTPUT_DIR, filename)
-
-            response = client.audio.speech.create(
-                model="gpt-4o-mini-tts",
-                voice="sage",  # or "shimmer", "onyx", etc.
-                input=chunk
-            )
-            response.stream_to_file(audio_path)
-
-            audio_results.append((f"https://langgraph-lesson-modifier.onrender.com/audio/{filename}", chunk.strip()))
-            #audio_results.append((audio_path, chunk.strip()))
+            with track_call("openai_tts"):
+                response = client.audio.speech.create(
+                    model=model,
+                    voice=voice,
+                    input=text
+                )
+                response.stream_to_file(tmp_path)
+            os.replace(tmp_path, audio_path)
+        except Exception:
+            # Don't leave a partial download behind for GC to find
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        record_bytes_written("audio", os.path.getsize(audio_path))
+    return audio_path
+
+def generate_audio_urls_for_chunks(chunks: List[str]) -> List[Optional[str]]:
+    """
+    Synthesizes every non-empty chunk concurrently (TTS_CONCURRENCY at a time),
+    identical chunks only once.
+    Returns one public audio URL per input chunk, or None where the chunk was
+    empty or synthesis failed.
+    """
+    unique_texts = list(dict.fromkeys(chunk for chunk in chunks if chunk.strip()))
+    if not unique_texts:
+        return [None] * len(chunks)
+
+    def synthesize(text: str):
+        try:
+            return synthesize_cached(text)
         except Exception as e:
-            print(f"[AudioAgent] Failed to generate audio for chunk {idx}: {e}")
-            continue
+            print(f"[AudioAgent] Failed to generate audio for chunk: {text[:40]!r}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(TTS_CONCURRENCY, len(unique_texts))) as pool:
+        paths = dict(zip(unique_texts, pool.map(in_current_context(synthesize), unique_texts)))
 
-    return audio_results
+    urls = []
+    for chunk in chunks:
+        audio_path = paths.get(chunk)
+        if audio_path is None:
+            urls.append(None)
+        else:
+            filename = os.path.basename(audio_path)
+            urls.append(f"https://langgraph-lesson-modifier.onrender.com/audio/{filename}")
+    return urls
 
 
 def generate_audio_file(text: str) -> str:
     """
     Generate audio for a single sentence or prompt.
+    Identical prompts are served from the existing MP3.
     Returns the file path to the generated MP3.
     """
     if not text.strip():
         raise ValueError("Empty text provided for TTS.")
 
-    filename = f"audio_{uuid.uuid4().hex}.mp3"
-    audio_path = os.path.join(OUTPUT_DIR, filename)
-
-    response = client.audio.speech.create(
-        model="gpt-4o-mini-tts",  # or "tts-1-hd" for better quality
-        voice="sage",  # Or coral, shimmer, onyx, etc.
-        input=text
-    )
-    response.stream_to_file(audio_path)
-
-    return audio_path
+    return synthesize_cached(text)
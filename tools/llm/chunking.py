@@ -0,0 +1,381 @@
+# tools/llm/chunking.py
+
+import os
+import re
+from typing import List, NamedTuple, Sequence, Tuple
+
+from utils.tokenizer import count_tokens
+
+# Max lesson tokens sent to GPT-4o in one call (0 = no limit). The model
+# retells each day in full, so output (and latency) grows with this; past
+# ~6k input tokens a call risks the 60 s request timeout. Longer days are
+# adapted in several parts (see Chunk.parts).
+DAY_TOKEN_BUDGET = int(os.getenv("MODIFY_DAY_TOKEN_BUDGET", "6000"))
+
+# Markdown headings and "Chapter 3" / "Part II" / "Day 2:" style titles
+HEADING_RE = re.compile(r"^(#{1,6}\s|(chapter|part|section|lesson|unit|day|week)\s+[\w.]+\b)", re.IGNORECASE)
+HEADING_MAX_CHARS = 60
+# An oversized paragraph is cut into pieces of about 1/PIECES_PER_LIMIT of
+# the limit, so day boundaries inside it can land close to an even share.
+PIECES_PER_LIMIT = 8
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+
+class Block(NamedTuple):
+    """
+    Smallest unit a chunk boundary may fall between: a paragraph (with any
+    headings right above it), or a piece of a paragraph too large to keep whole.
+    """
+    text: str
+    tokens: int
+    continues: bool = False   # rest of the previous block's paragraph: join with a space
+
+class Chunk(NamedTuple):
+    """
+    parts: the chunk's text in consecutive pieces of at most the token
+    budget, one model call each; just [text] when the chunk fits the budget.
+    """
+    text: str
+    tokens: int
+    parts: List[str]
+
+def is_heading(paragraph: str) -> bool:
+    """
+    Headings stay attached to the paragraph that follows them. Besides
+    markdown/"Chapter N" headings, a short line without closing punctuation
+    (a title extracted from a PDF or DOCX) counts as one.
+    """
+    if HEADING_RE.match(paragraph):
+        return True
+    return len(paragraph) <= HEADING_MAX_CHARS and paragraph[-1] not in ".!?;,\"'”’)]"
+
+def _pack(pieces: Sequence[str], limit: int, separator: str) -> List[str]:
+    """
+    Greedily joins consecutive pieces into groups of at most `limit` tokens
+    (a single piece over the limit becomes its own group).
+    """
+    groups, current, load = [], [], 0
+    for piece in pieces:
+        tokens = count_tokens(piece)
+        if current and load + tokens > limit:
+            groups.append(separator.join(current))
+            current, load = [], 0
+        current.append(piece)
+        load += tokens
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+def _split_paragraph(paragraph: str, limit: int, budget: int) -> List[str]:
+    """
+    Splits an oversized paragraph at sentence ends into pieces of about
+    `limit` tokens. A single sentence over `budget` (if set) is also split
+    at word boundaries.
+    """
+    pieces = []
+    for sentence in SENTENCE_END_RE.split(paragraph):
+        if budget and count_tokens(sentence) > budget:
+            pieces.extend(_pack(sentence.split(" "), budget, " "))
+        elif sentence:
+            pieces.append(sentence)
+    return _pack(pieces, limit, " ")
+
+def split_into_blocks(text: str, limit: int = 0, budget: int = 0) -> List[Block]:
+    """
+    Paragraph blocks of `text`. Paragraphs over `limit` tokens (if set) are
+    sub-split into pieces of about limit / PIECES_PER_LIMIT, see _split_paragraph.
+    """
+    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+    blocks: List[Block] = []
+    headings: List[str] = []
+
+    for index, paragraph in enumerate(paragraphs):
+        if is_heading(paragraph) and index < len(paragraphs) - 1:
+            headings.append(paragraph)
+            continue
+
+        unit = "\n\n".join(headings + [paragraph])
+        tokens = count_tokens(unit)
+        if not limit or tokens <= limit:
+            blocks.append(Block(unit, tokens))
+        else:
+            heading_text = "".join(f"{heading}\n\n" for heading in headings)
+            heading_tokens = count_tokens(heading_text)
+            pieces = _split_paragraph(
+                paragraph,
+                max((limit - heading_tokens) // PIECES_PER_LIMIT, 1),
+                max(budget - heading_tokens, 1) if budget else 0,
+            )
+            pieces[0] = heading_text + pieces[0]
+            blocks.extend(Block(piece, count_tokens(piece), i > 0) for i, piece in enumerate(pieces))
+        headings = []
+    return blocks
+
+def _parts_needed(weights: Sequence[int], start: int, cap: int) -> int:
+    """
+    Fewest consecutive groups weights[start:] fits in with no group over `cap`.
+    """
+    parts, load = 0, 0
+    for weight in weights[start:]:
+        if parts == 0 or load + weight > cap:
+            parts += 1
+            load = 0
+        load += weight
+    return parts
+
+def _min_max_load(weights: Sequence[int], parts: int) -> int:
+    """
+    Smallest possible heaviest group when splitting weights into `parts` consecutive groups.
+    """
+    low, high = max(weights), sum(weights)
+    while low < high:
+        middle = (low + high) // 2
+        if _parts_needed(weights, 0, middle) <= parts:
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+def _partition(weights: Sequence[int], parts: int, cap: int) -> List[range]:
+    """
+    Exactly `parts` consecutive groups (len(weights) >= parts), none over
+    `cap`. Each group ends as close as possible to an even share of what is
+    left, as long as the rest still fits under `cap`.
+    """
+    groups: List[range] = []
+    start, load = 0, 0
+    remaining = sum(weights)
+    for index, weight in enumerate(weights):
+        parts_left = parts - len(groups)   # including the group being filled
+        if index > start and parts_left > 1:
+            must_close = load + weight > cap or len(weights) - index <= parts_left - 1
+            want_close = (
+                load + weight / 2 > remaining / parts_left
+                and _parts_needed(weights, index, cap) <= parts_left - 1
+            )
+            if must_close or want_close:
+                groups.append(range(start, index))
+                remaining -= load
+                start, load = index, 0
+        load += weight
+    groups.append(range(start, len(weights)))
+    return groups
+
+def _split_largest_block(blocks: List[Block]) -> bool:
+    """
+    Splits the largest multi-sentence block in two, in place. False if none can be split.
+    """
+    for index in sorted(range(len(blocks)), key=lambda i: -blocks[i].tokens):
+        sentences = SENTENCE_END_RE.split(blocks[index].text)
+        if len(sentences) > 1:
+            half = len(sentences) // 2
+            first, second = " ".join(sentences[:half]), " ".join(sentences[half:])
+            blocks[index:index + 1] = [
+                Block(first, count_tokens(first), blocks[index].continues),
+                Block(second, count_tokens(second), True),
+            ]
+            return True
+    return False
+
+def _join(blocks: Sequence[Block]) -> str:
+    parts = []
+    for i, block in enumerate(blocks):
+        if i:
+            parts.append(" " if block.continues else "\n\n")
+        parts.append(block.text)
+    return "".join(parts)
+
+def plan_chunks(text: str, n: int, budget: int = DAY_TOKEN_BUDGET) -> List[Chunk]:
+    """
+    Splits `text` into `n` consecutive chunks with token counts as even as
+    possible. Chunk boundaries fall between paragraphs (never right after a
+    heading); a paragraph is only broken, at sentence ends, when it is over
+    `budget` or larger than an even share of the text, and only a sentence
+    over `budget` is broken between words.
+
+    A chunk over `budget` tokens is split again, the same way, into the
+    fewest parts that fit (Chunk.parts). Chunks are empty only when the
+    text has fewer sentences than `n`.
+    """
+    n = max(1, n)
+    share = -(-count_tokens(text) // n)
+    limit = min(budget, share) if budget else share
+    blocks = split_into_blocks(text, limit, budget)
+
+    while len(blocks) < n and _split_largest_block(blocks):
+        pass
+    if not blocks:
+        return [Chunk("", 0, [""])] * n
+
+    parts = min(n, len(blocks))
+    weights = [block.tokens for block in blocks]
+    chunks = [
+        _chunk(blocks[group.start:group.stop], budget)
+        for group in _partition(weights, parts, _min_max_load(weights, parts))
+    ]
+    return chunks + [Chunk("", 0, [""])] * (n - parts)
+
+def _chunk(blocks: Sequence[Block], budget: int) -> Chunk:
+    weights = [block.tokens for block in blocks]
+    tokens = sum(weights)
+    text = _join(blocks)
+    if not budget or tokens <= budget:
+        return Chunk(text, tokens, [text])
+
+    # Blocks are at most `budget` tokens (see split_into_blocks), so each part fits
+    parts = _parts_needed(weights, 0, budget)
+    groups = _partition(weights, parts, _min_max_load(weights, parts))
+    return Chunk(text, tokens, [_join(blocks[group.start:group.stop]) for group in groups])
+
+def split_text_into_chunks(text: str, n: int, budget: int = DAY_TOKEN_BUDGET) -> List[str]:
+    """
+    Text of each chunk from plan_chunks.
+    """
+    return [chunk.text for chunk in plan_chunks(text, n, budget)]
+
+# ----- worksheets -----
+
+# Most lesson tokens per worksheet section adapted in one GPT-4o call (a
+# longer single question is a section on its own). Worksheets at or under
+# this size are still adapted in a single call.
+WORKSHEET_SECTION_TOKENS = int(os.getenv("MODIFY_WORKSHEET_SECTION_TOKENS", "600"))
+
+# "12.", "12)", "Q12:", "Question 12.", "### 12." and "**12.**" starts a question
+QUESTION_RE = re.compile(
+    r"^(?P<prefix>\s*(?:#{1,6}\s*)?(?:\*\*)?(?:(?:Question|Q)\.?\s*)?)(?P<number>\d{1,3})(?P<suffix>[.):])",
+    re.IGNORECASE,
+)
+# "Exercise 3", "Task 2" and "Problem 4" start a question too
+NAMED_QUESTION_RE = re.compile(r"^\s*(exercise|task|problem|activity)\s+\d+\b", re.IGNORECASE)
+DIVIDER_RE = re.compile(r"^\s*(?:[-_*=~]\s*){3,}$")
+
+class WorksheetSection(NamedTuple):
+    """
+    text: what is sent to the model
+    tokens: size of `text`
+    numbers: question numbers in `text`, in order (see restore_question_numbers)
+    divider: original divider line(s) that followed the section, or ""
+    """
+    text: str
+    tokens: int
+    numbers: List[int]
+    divider: str
+
+def _is_question_start(line: str) -> bool:
+    return bool(QUESTION_RE.match(line) or NAMED_QUESTION_RE.match(line))
+
+def _is_worksheet_heading(line: str) -> bool:
+    # Short lines are usually answer options on a worksheet, so only explicit headings count
+    stripped = line.strip()
+    return bool(HEADING_RE.match(stripped)) or (
+        stripped.isupper() and len(stripped) <= HEADING_MAX_CHARS and any(c.isalpha() for c in stripped)
+    )
+
+def _worksheet_items(text: str) -> List[Tuple[List[str], str]]:
+    """
+    (lines, trailing divider) per item. An item is a question (from its
+    number to the next question, heading or divider), with any headings
+    directly above it, or the text before the first question.
+    """
+    items: List[Tuple[List[str], str]] = []
+    lines: List[str] = []
+    only_headings = True
+
+    def close(divider: str = "") -> None:
+        nonlocal lines, only_headings
+        if lines or divider:
+            items.append((lines, divider))
+        lines, only_headings = [], True
+
+    for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        if DIVIDER_RE.match(line):
+            close(line.strip())
+            continue
+        if not line.strip():
+            if lines:
+                lines.append("")
+            continue
+        heading = _is_worksheet_heading(line)
+        if (heading or _is_question_start(line)) and lines and not only_headings:
+            close()
+        lines.append(line.rstrip())
+        only_headings = only_headings and heading
+    close()
+    return items
+
+def split_worksheet(text: str, target_tokens: int = WORKSHEET_SECTION_TOKENS) -> List[WorksheetSection]:
+    """
+    Splits a worksheet into the fewest sections of at most target_tokens
+    (or the largest single question, if bigger), balanced in size. Splits
+    fall only between questions (never inside one, never right after a
+    heading). Dividers at a split point are kept out of the sections and
+    re-inserted verbatim by join_worksheet_sections.
+    """
+    items: List[Tuple[str, str]] = []
+    leading = ""
+    for lines, divider in _worksheet_items(text):
+        body = "\n".join(lines).strip()
+        if body:
+            items.append((f"{leading}\n\n{body}" if leading else body, divider))
+            leading = ""
+        elif items:
+            # Back-to-back dividers stay together after the previous item
+            previous_body, previous_divider = items[-1]
+            items[-1] = (previous_body, f"{previous_divider}\n\n{divider}" if previous_divider else divider)
+        else:
+            leading = f"{leading}\n\n{divider}" if leading else divider
+    if not items:
+        return []
+
+    weights = [count_tokens(body) for body, _ in items]
+    parts = _parts_needed(weights, 0, max(target_tokens, *weights)) if target_tokens else 1
+    groups = _partition(weights, parts, _min_max_load(weights, parts)) if parts > 1 else [range(len(items))]
+
+    sections = []
+    for group in groups:
+        pieces = []
+        for index in group:
+            body, divider = items[index]
+            pieces.append(body)
+            if divider and index != group.stop - 1:
+                pieces.append(divider)
+        section_text = "\n\n".join(pieces)
+        numbers = [
+            int(match.group("number"))
+            for match in map(QUESTION_RE.match, section_text.split("\n")) if match
+        ]
+        sections.append(WorksheetSection(
+            section_text,
+            sum(weights[index] for index in group),
+            numbers,
+            items[group.stop - 1][1],
+        ))
+    return sections
+
+def restore_question_numbers(adapted: str, numbers: Sequence[int]) -> str:
+    """
+    If the model restarted a section's numbering at 1, puts the original
+    question numbers back. Output whose numbering is anything else is left alone.
+    """
+    lines = adapted.split("\n")
+    found = [(i, match) for i, match in enumerate(map(QUESTION_RE.match, lines)) if match]
+    if not numbers or len(found) != len(numbers):
+        return adapted
+    current = [int(match.group("number")) for _, match in found]
+    if current == list(numbers) or current != list(range(1, len(numbers) + 1)):
+        return adapted
+
+    for (i, match), number in zip(found, numbers):
+        lines[i] = f"{match.group('prefix')}{number}{match.group('suffix')}{lines[i][match.end():]}"
+    return "\n".join(lines)
+
+def join_worksheet_sections(sections: Sequence[WorksheetSection], adapted: Sequence[str]) -> str:
+    """
+    Stitches adapted sections back together in order, with the original
+    dividers between them and the original question numbers.
+    """
+    parts = []
+    for section, text in zip(sections, adapted):
+        parts.append(restore_question_numbers(text.strip(), section.numbers))
+        if section.divider:
+            parts.append(section.divider)
+    return "\n\n".join(part for part in parts if part)
@@ -1,19 +1,65 @@
 # tools/llm/modify.py
 
 import os
-from openai import OpenAI
-from typing import List
+from openai import AsyncOpenAI
+from typing import List, Dict, Optional, Callable, Awaitable, Tuple
+from utils.cache import ResponseCache, make_cache_key
+from utils.llm_usage import openai_call, prompt_parts
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+MODEL = "gpt-4o"
+TEMPERATURE = 0.4
+
+# Bump when either prompt template changes so cached adaptations are not reused.
+PROMPT_TEMPLATE_VERSION = "1"
+
+# Adaptation cache: set LLM_CACHE_DISABLED=1 to always call the model.
+CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+adaptation_cache = ResponseCache(
+    "adaptations",
+    max_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "256")),
+    max_disk_bytes=int(os.getenv("LLM_CACHE_DISK_MB", "200")) * 1024 * 1024,
+)
+
+LESSON_SYSTEM_PROMPT = (
+    "You are an inclusive education assistant who strictly follows adaptation rules. "
+    "You must always apply bilingual or accessibility modifications when requested."
+)
+
+WORKSHEET_SYSTEM_PROMPT = (
+    "You are a multilingual inclusive education assistant. "
+    "You rewrite worksheets for students with diverse learning and language needs, "
+    "keeping the structure unchanged while adding supports and placeholders."
+)
+
+def build_lesson_part_note(part: Optional[Tuple[int, int]]) -> str:
+    """
+    Extra instructions when one day is adapted in parts (part = (number, total)).
+    """
+    if part is None:
+        return ""
+    number, total = part
+    if number == 1:
+        scope = "Write the title, the Engager and the I Do retelling of this part. Stop after I Do; the next part continues it."
+    elif number < total:
+        scope = "Continue the I Do retelling with this part only. Do not add a title, Engager, We Do, You Do or Assessment."
+    else:
+        scope = "Continue the I Do retelling with this part, then write the We Do, You Do and Assessment sections for the day."
+    return f"""
+== PART {number} OF {total} ==
+This day's reading is too long for one response, so it is adapted in {total} parts that are joined in order afterwards.
+- {scope}
+- Retell this part in full; do not summarize or skip any of it.
+"""
 
-def modify_lesson_content(text: str, rules: List[str]) -> str:
+def build_lesson_prompt(text: str, rules: List[str], part: Optional[Tuple[int, int]] = None) -> str:
     """
-    Uses GPT‑4o to apply lesson adaptation rules to the input lesson content.
-    Produces a structured output: Engager → I Do → We Do → You Do.
-    Enforces side-by-side translations or accessibility features if required.
+    Builds the Engager → I Do → We Do → You Do prompt for one lesson chunk.
+    With `part`, the prompt is for one piece of a day adapted in parts.
     """
-    prompt = f"""
+    return f"""
 You are an expert inclusive education designer who adapts lessons for multilingual and special‑needs learners.
 
 == Student Profile Rules ==
@@ -76,45 +122,30 @@ Apply *all relevant rules*, including any language‑ or accessibility‑specifi
 
 == LESSON INPUT ==
 \"\"\"{text}\"\"\"
-
+{build_lesson_part_note(part)}
 Now produce the fully modified lesson based on the student profile rules.
 """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an inclusive education assistant who strictly follows adaptation rules. "
-                        "You must always apply bilingual or accessibility modifications when requested."
-                    )
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.4,
-            timeout=60
-        )
-        return response.choices[0].message.content.strip()
-
-    except Exception as e:
-        raise RuntimeError(f"Failed to modify lesson with LLM: {str(e)}")
-    
-
-
-def modify_lesson_content_worksheet(text: str, rules: List[str]) -> str:
+def build_worksheet_part_note(part: Optional[Tuple[int, int]]) -> str:
     """
-    Uses GPT‑4o to adapt worksheet content (questions, instructions, or exercises)
-    according to the provided student adaptation rules.
-
-    - Simplifies complex vocabulary and sentence structure.
-    - Adds bilingual support or translations if rules require.
-    - Adds [Insert Image: ...] and [Insert Audio: ...] placeholders only if rules demand media.
-    - Keeps the original worksheet’s logical structure (no Engager/I Do/We Do/You Do).
+    Extra instructions when the worksheet is adapted in parts (part = (number, total)).
     """
+    if part is None:
+        return ""
+    number, total = part
+    return f"""
+== PART {number} OF {total} ==
+This is one part of a longer worksheet; the other parts are adapted separately and joined afterwards.
+- Keep every question number exactly as written in this part (do NOT restart numbering at 1).
+- Do not add a worksheet title, introduction, summary or closing remarks; adapt only this part.
+"""
 
-    prompt = f"""
+def build_worksheet_prompt(text: str, rules: List[str], part: Optional[Tuple[int, int]] = None) -> str:
+    """
+    Builds the worksheet adaptation prompt (original worksheet structure is kept).
+    With `part`, the prompt is for one section of a worksheet adapted in parts.
+    """
+    return f"""
 You are an expert inclusive education designer adapting **worksheet content** for multilingual and special-needs students.
 
 == Student Profile Rules ==
@@ -174,29 +205,159 @@ Adapt the following worksheet into valid, clean **Markdown format** with clear h
 - Use `##` for section headings, `###` for questions, plain text for options.
 - Insert translated versions and `[Insert Audio: ...]` only if required by student profile rules.
 - Do NOT use any Markdown code fences or triple backticks in the output.
-
+{build_worksheet_part_note(part)}
 Now output the fully adapted worksheet in Markdown format only.
 """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a multilingual inclusive education assistant. "
-                        "You rewrite worksheets for students with diverse learning and language needs, "
-                        "keeping the structure unchanged while adding supports and placeholders."
-                    )
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.4,
-            timeout=60
+def normalize_text(text: str) -> str:
+    """
+    Normalizes line endings and trailing whitespace so trivially different
+    copies of the same lesson share a cache entry.
+    """
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+def worksheet_cache_kind(part: Optional[Tuple[int, int]]) -> str:
+    # A part's prompt depends on its position, so it is part of the key
+    return "worksheet" if part is None else f"worksheet_part_{part[0]}_of_{part[1]}"
+
+def lesson_cache_kind(part: Optional[Tuple[int, int]]) -> str:
+    return "lesson" if part is None else f"lesson_part_{part[0]}_of_{part[1]}"
+
+def adaptation_cache_key(kind: str, text: str, rules: List[str]) -> str:
+    return make_cache_key(
+        kind,
+        normalize_text(text),
+        sorted(rules),
+        MODEL,
+        PROMPT_TEMPLATE_VERSION,
+        TEMPERATURE,
+    )
+
+def _cached(key: str, use_cache: bool) -> Optional[str]:
+    if not use_cache or CACHE_DISABLED:
+        return None
+    return adaptation_cache.get(key)
+
+def _store(key: str, value: str) -> str:
+    if not CACHE_DISABLED:
+        adaptation_cache.set(key, value)
+    return value
+
+def _messages(system_prompt: str, prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def _prompt_parts(messages: List[Dict[str, str]], text: str, rules: List[str]) -> Dict[str, int]:
+    return prompt_parts(messages, lesson_text=len(text), rules=sum(len(rule) for rule in rules))
+
+async def _acomplete(
+    call_site: str,
+    messages: List[Dict[str, str]],
+    parts: Dict[str, int],
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> str:
+    """
+    Runs one chat completion on AsyncOpenAI. With `on_token`, the response is
+    requested with stream=True and every text delta is awaited through it.
+    """
+    if on_token is None:
+        with openai_call(call_site, MODEL, parts) as call:
+            response = await async_client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=TEMPERATURE,
+                timeout=60
+            )
+            call.usage = response.usage
+        return response.choices[0].message.content.strip()
+
+    pieces = []
+    with openai_call(call_site, MODEL, parts) as call:
+        stream = await async_client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=TEMPERATURE,
+            timeout=60,
+            stream=True,
+            stream_options={"include_usage": True}  # usage arrives in a final chunk with no choices
         )
+        async for chunk in stream:
+            if chunk.usage is not None:
+                call.usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                pieces.append(delta)
+                await on_token(delta)
+    return "".join(pieces).strip()
+
+async def amodify_lesson_content(
+    text: str,
+    rules: List[str],
+    use_cache: bool = True,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    part: Optional[Tuple[int, int]] = None,
+) -> str:
+    """
+    Uses GPT‑4o to apply lesson adaptation rules to the input lesson content.
+    Produces a structured output: Engager → I Do → We Do → You Do.
+    Enforces side-by-side translations or accessibility features if required.
+    `on_token` receives the generated text incrementally (a cache hit arrives as one piece).
 
-        return response.choices[0].message.content.strip()
+    `part` = (number, total) adapts one piece of a day that is over the
+    token budget (see tools.llm.chunking.plan_chunks).
+    """
+    key = adaptation_cache_key(lesson_cache_kind(part), text, rules)
+    cached = _cached(key, use_cache)
+    if cached is not None:
+        if on_token is not None:
+            await on_token(cached)
+        return cached
+
+    try:
+        messages = _messages(LESSON_SYSTEM_PROMPT, build_lesson_prompt(text, rules, part))
+        call_site = "modify.lesson" if part is None else "modify.lesson_part"
+        modified = await _acomplete(call_site, messages, _prompt_parts(messages, text, rules), on_token)
+        return _store(key, modified)
+
+    except Exception as e:
+        raise RuntimeError(f"Failed to modify lesson with LLM: {str(e)}")
+
+async def amodify_lesson_content_worksheet(
+    text: str,
+    rules: List[str],
+    use_cache: bool = True,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    part: Optional[Tuple[int, int]] = None,
+) -> str:
+    """
+    Uses GPT‑4o to adapt worksheet content (questions, instructions, or exercises)
+    according to the provided student adaptation rules.
+
+    - Simplifies complex vocabulary and sentence structure.
+    - Adds bilingual support or translations if rules require.
+    - Adds [Insert Image: ...] and [Insert Audio: ...] placeholders only if rules demand media.
+    - Keeps the original worksheet’s logical structure (no Engager/I Do/We Do/You Do).
+
+    `part` = (number, total) adapts one section of a worksheet split by
+    tools.llm.chunking.split_worksheet.
+    """
+    key = adaptation_cache_key(worksheet_cache_kind(part), text, rules)
+    cached = _cached(key, use_cache)
+    if cached is not None:
+        if on_token is not None:
+            await on_token(cached)
+        return cached
+
+    try:
+        messages = _messages(WORKSHEET_SYSTEM_PROMPT, build_worksheet_prompt(text, rules, part))
+        call_site = "modify.worksheet" if part is None else "modify.worksheet_part"
+        modified = await _acomplete(call_site, messages, _prompt_parts(messages, text, rules), on_token)
+        return _store(key, modified)
 
     except Exception as e:
         raise RuntimeError(f"Failed to modify worksheet with LLM: {str(e)}")
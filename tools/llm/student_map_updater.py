@@ -1,4 +1,5 @@
 from openai import OpenAI
+from utils.llm_usage import openai_call, prompt_parts
 import os
 import re
 
@@ -34,11 +35,15 @@ Student Feedback:
 Updated Rule File:
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-    )
+    messages = [{"role": "user", "content": prompt}]
+    parts = prompt_parts(messages, rule_file=len(str(rule_file)), feedback=len(feedback))
+    with openai_call("student_map_updater.update_rules", "gpt-4o", parts) as call:
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.3,
+        )
+        call.usage = response.usage
 
     raw_output = response.choices[0].message.content.strip()
     clean_output = clean_llm_code_block(raw_output)
@@ -3,14 +3,125 @@ import uuid
 import json
 import re
 import urllib.parse
+from typing import List, NamedTuple, Optional
+from utils.output_store import output_store
+from utils.metrics import record_bytes_written
+
+NUMBERED_RE = re.compile(r"^\d+\.")
+AUDIO_RE = re.compile(r"\[Insert Audio:\s*(.+?)\]")
+IMAGE_RE = re.compile(r"\[Insert Image:\s*(.+?)\]")
+
+class Block(NamedTuple):
+    """
+    One line of the lesson, classified once for every writer.
+
+    kind: "blank", "title", "section", "question", "label", "audio", "image" or "text"
+    media / placeholder: set when the line holds an [Insert Audio/Image: ...]
+    placeholder, even if the line is also a heading.
+    """
+    kind: str
+    text: str
+    media: Optional[str] = None
+    placeholder: Optional[str] = None
+
+def tokenize_lesson(lesson_text: str) -> List[Block]:
+    """
+    Turns the lesson into a typed block stream in a single pass over its lines.
+    """
+    blocks = []
+    for line in lesson_text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            blocks.append(Block("blank", ""))
+            continue
 
-FINAL_TXT_DIR = "data/outputs/final"
-FINAL_JSON_DIR = "data/outputs/json"
-FINAL_MD_DIR = "data/outputs/markdown"
+        media = placeholder = None
+        if "[Insert " in stripped:
+            match = AUDIO_RE.search(stripped)
+            if match:
+                media, placeholder = "audio", match.group(1).strip()
+            else:
+                match = IMAGE_RE.search(stripped)
+                if match:
+                    media, placeholder = "image", match.group(1).strip()
+
+        lowered = stripped.lower()
+        if lowered.startswith("title:"):
+            kind = "title"
+        elif "instructions" in lowered:
+            kind = "section"
+        elif NUMBERED_RE.match(stripped):
+            kind = "question"
+        elif stripped.endswith(":"):
+            kind = "label"
+        else:
+            kind = media or "text"
 
-os.makedirs(FINAL_TXT_DIR, exist_ok=True)
-os.makedirs(FINAL_JSON_DIR, exist_ok=True)
-os.makedirs(FINAL_MD_DIR, exist_ok=True)
+        blocks.append(Block(kind, stripped, media, placeholder))
+    return blocks
+
+def render_markdown(blocks: List[Block]) -> str:
+    md_lines = []
+    for block in blocks:
+        kind = block.kind
+        if kind == "blank":
+            md_lines.append("")
+        elif kind == "title":
+            md_lines.append(f"# {block.text.replace('Title:', '').strip()}")
+        elif kind == "section":
+            md_lines.append(f"## {block.text}")
+        elif kind == "question":
+            md_lines.append(f"### {block.text}")
+        elif kind == "label":
+            md_lines.append(f"**{block.text}**")
+        # Preserve placeholders as plain text
+        elif kind == "audio":
+            md_lines.append(f"🔊 [Insert Audio: {block.placeholder}]")
+        elif kind == "image":
+            md_lines.append(f"🔍 [Insert Image: {block.placeholder}]")
+        else:
+            md_lines.append(block.text)
+    return "\n\n".join(md_lines)
+
+def json_blocks(blocks: List[Block]) -> List[dict]:
+    items = []
+    for block in blocks:
+        if block.media:
+            items.append({"type": block.media, "placeholder": block.placeholder})
+        elif block.kind != "blank":
+            items.append({"type": "text", "content": block.text})
+    return items
+
+def render_json(blocks: List[Block]) -> str:
+    """
+    Same bytes as json.dump(json_blocks(blocks), ensure_ascii=False, indent=2),
+    without the pure-Python indenting encoder.
+    """
+    items = json_blocks(blocks)
+    if not items:
+        return "[]"
+
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    rendered = []
+    for item in items:
+        (type_key, value_key) = item.keys()
+        rendered.append(
+            "  {\n"
+            f'    "type": {encode(item[type_key])},\n'
+            f'    "{value_key}": {encode(item[value_key])}\n'
+            "  }"
+        )
+    return "[\n" + ",\n".join(rendered) + "\n]"
+
+# Only the lesson text (.txt) is written by generate_final_output; it is the
+# canonical record. The .md and .json views are rendered from its block
+# stream the first time they are requested, then kept in the output store
+# (re-rendered if GC has since dropped them).
+OUTPUT_FORMATS = {
+    "md": ("markdown", render_markdown),
+    "json": ("json", render_json),
+}
+LESSON_FILENAME_RE = re.compile(r"^final_lesson_([0-9a-f]{32})\.(txt|md|json)$")
 
 def generate_final_output(lesson_text: str) -> dict:
     file_id = uuid.uuid4().hex
@@ -18,75 +129,53 @@ def generate_final_output(lesson_text: str) -> dict:
     json_filename = f"final_lesson_{file_id}.json"
     md_filename = f"final_lesson_{file_id}.md"
 
-    txt_path = os.path.join(FINAL_TXT_DIR, txt_filename)
-    json_path = os.path.join(FINAL_JSON_DIR, json_filename)
-    md_path = os.path.join(FINAL_MD_DIR, md_filename)
+    txt_path = output_store.path("final", txt_filename)
+    json_path = output_store.path("json", json_filename)
+    md_path = output_store.path("markdown", md_filename)
 
-    enriched_text = lesson_text
+    # Canonical record only; .md / .json are rendered lazily (see materialize_output)
     with open(txt_path, "w") as f:
-        f.write(enriched_text)
-
-    # === Markdown Output ===
-    md_lines = []
-    lines = enriched_text.splitlines()
-
-    for line in lines:
-        stripped = line.strip()
-        if not stripped:
-            md_lines.append("")
-            continue
-
-        if stripped.lower().startswith("title:"):
-            md_lines.append(f"# {stripped.replace('Title:', '').strip()}")
-            continue
-        elif "instructions" in stripped.lower():
-            md_lines.append(f"## {stripped}")
-            continue
-        elif re.match(r"^\d+\.", stripped):
-            md_lines.append(f"### {stripped}")
-            continue
-        elif stripped.endswith(":"):
-            md_lines.append(f"**{stripped}**")
-            continue
-
-        # Preserve placeholders as plain text
-        audio_match = re.search(r"\[Insert Audio:\s*(.+?)\]", stripped)
-        if audio_match:
-            md_lines.append(f"🔊 [Insert Audio: {audio_match.group(1).strip()}]")
-            continue
-
-        image_match = re.search(r"\[Insert Image:\s*(.+?)\]", stripped)
-        if image_match:
-            md_lines.append(f"🔍 [Insert Image: {image_match.group(1).strip()}]")
-            continue
-
-        md_lines.append(stripped)
-
-    with open(md_path, "w") as md:
-        md.write("\n\n".join(md_lines))
-
-    # === JSON Output ===
-    blocks = []
-    for line in lines:
-        audio_match = re.search(r"\[Insert Audio:\s*(.+?)\]", line)
-        if audio_match:
-            blocks.append({"type": "audio", "placeholder": audio_match.group(1).strip()})
-            continue
-
-        image_match = re.search(r"\[Insert Image:\s*(.+?)\]", line)
-        if image_match:
-            blocks.append({"type": "image", "placeholder": image_match.group(1).strip()})
-            continue
-
-        text_content = line.strip()
-        if text_content:
-            blocks.append({"type": "text", "content": text_content})
-
-    with open(json_path, "w") as jf:
-        json.dump(blocks, jf, ensure_ascii=False, indent=2)
+        f.write(lesson_text)
+    record_bytes_written("final_output", os.path.getsize(txt_path))
+    # Keeps the lesson's audio/images from being garbage-collected while it exists
+    output_store.record_references("final", txt_filename, lesson_text)
 
     return {
         "txt_path": txt_path,
         "json_path": json_path,
         "md_path": md_path
-    }
\ No newline at end of file
+    }
+
+def materialize_output(filename: str) -> Optional[str]:
+    """
+    Returns the on-disk path of a final_lesson_<id>.{md,json} file, rendering
+    it from the stored lesson text on first access. Returns None if there is
+    no such lesson. Each access restarts the lesson's retention period.
+    """
+    match = LESSON_FILENAME_RE.match(filename)
+    if not match or match.group(2) not in OUTPUT_FORMATS:
+        return None
+
+    category, render = OUTPUT_FORMATS[match.group(2)]
+    txt_path = output_store.resolve("final", f"final_lesson_{match.group(1)}.txt")
+    out_path = output_store.resolve(category, filename)
+    if txt_path:
+        output_store.touch(txt_path)  # a lesson in use keeps its retention period going
+    if out_path:
+        output_store.touch(out_path)
+        return out_path
+    if txt_path is None:
+        return None
+    try:
+        with open(txt_path, "r", newline="") as f:
+            lesson_text = f.read()
+    except FileNotFoundError:
+        return None
+
+    out_path = output_store.path(category, filename)
+    tmp_path = output_store.temp_path(category, ".tmp")
+    with open(tmp_path, "w") as out:
+        out.write(render(tokenize_lesson(lesson_text)))
+    os.replace(tmp_path, out_path)
+    record_bytes_written(category, os.path.getsize(out_path))
+    return out_path
@@ -0,0 +1,198 @@
+# tools/output/html_to_markdown.py
+
+import re
+import html.entities
+from typing import List, Optional, Tuple
+
+import html2text
+
+SPECIAL_CHARS_RE = re.compile(r"([&<>])")
+SPECIAL_ENTITIES = {"&": "amp", "<": "lt", ">": "gt"}
+# Elements BeautifulSoup never keeps open (bs4's HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+VOID_ELEMENTS = frozenset((
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image",
+    "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source",
+    "spacer", "track", "wbr",
+))
+
+# Event = ("start", tag, attrs) | ("end", tag, None) | ("text", string, None)
+Event = Tuple[str, str, Optional[list]]
+
+class EditorMarkdownConverter(html2text.HTML2Text):
+    """
+    Converts the lesson editor's HTML to markdown in a single parse.
+
+    Rewrites, applied as the HTML streams through html2text's own parser:
+    - <audio> becomes "[AUDIO: <first <source> src>]" (or "[AUDIO]")
+    - a <span> whose text contains "[IMAGE:" becomes that text, minus the
+      "✎" edit control and everything after it
+
+    Text and tags reach html2text exactly as they would after a BeautifulSoup
+    round trip (entities decoded, then only &, < and > re-escaped; stray end
+    tags dropped, misnested and unclosed elements closed), so the output
+    matches the previous soup -> str -> html2text pipeline.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.body_width = 0                # no automatic line breaks
+        self.ignore_links = False
+        self.ignore_images = False
+        self.ignore_emphasis = False
+        self.protect_links = True          # keeps full URLs intact
+
+        self._text: List[str] = []         # current run of parser text
+        self._open_tags: List[str] = []    # non-void elements not yet closed, outermost first
+        self._audio_depth = 0
+        self._audio_src: Optional[str] = None
+        self._audio_has_source = False
+        self._span_depth = 0
+        self._span_events: List[Event] = []
+        self._pending_output: List[str] = []
+
+    # ----- parser callbacks -----
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag not in VOID_ELEMENTS:
+            self._open_tags.append(tag)
+        self._audio_layer(("start", tag, attrs))
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        # Like BeautifulSoup: an end tag closes its element and everything
+        # opened inside it; one with no open element is ignored
+        if tag not in self._open_tags:
+            return
+        self._close_to(self._open_tags[::-1].index(tag) + 1)
+
+    def handle_data(self, data, entity_char=False):
+        self._text.append(data)
+
+    def handle_entityref(self, name):
+        character = html.entities.html5.get(f"{name};")
+        self._text.append(character if character is not None else f"&{name}")
+
+    def handle_charref(self, name):
+        try:
+            code = int(name[1:], 16) if name[:1] in ("x", "X") else int(name)
+        except ValueError:
+            self._text.append(f"&#{name}")
+            return
+        if 0x80 <= code <= 0x9F:
+            # Browsers (and BeautifulSoup) read these as windows-1252
+            character = bytes([code]).decode("cp1252", errors="replace")
+        elif 0 < code < 0x110000 and not 0xD800 <= code < 0xE000:
+            character = chr(code)
+        else:
+            character = "�"
+        self._text.append(character)
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        # Elements left open at the end of the document are closed there
+        self._close_to(len(self._open_tags))
+        self._emit_text()
+
+    def _close_to(self, count: int) -> None:
+        """
+        Ends the `count` innermost open elements, innermost first.
+        """
+        for _ in range(count):
+            self._audio_layer(("end", self._open_tags.pop(), None))
+
+    def _flush_text(self) -> None:
+        if self._text:
+            text = "".join(self._text)
+            self._text = []
+            self._audio_layer(("text", text, None))
+
+    # ----- rewrites -----
+
+    def _audio_layer(self, event: Event) -> None:
+        kind, value, attrs = event
+        if kind == "start" and value == "audio":
+            if self._audio_depth == 0:
+                self._audio_src = None
+                self._audio_has_source = False
+            self._audio_depth += 1
+            return
+        if not self._audio_depth:
+            self._span_layer(event)
+            return
+
+        if kind == "start" and value == "source" and not self._audio_has_source:
+            self._audio_has_source = True
+            for name, attr_value in attrs:
+                if name == "src":
+                    self._audio_src = attr_value or ""
+                    break
+        elif kind == "end" and value == "audio":
+            self._audio_depth -= 1
+            if self._audio_depth == 0:
+                placeholder = "[AUDIO]" if self._audio_src is None else f"[AUDIO: {self._audio_src}]"
+                self._span_layer(("text", f"\n\n{placeholder}\n\n", None))
+
+    def _span_layer(self, event: Event) -> None:
+        kind, value, _ = event
+        if not self._span_depth:
+            if kind == "start" and value == "span":
+                self._span_depth = 1
+                self._span_events = [event]
+            else:
+                self._output(event)
+            return
+
+        self._span_events.append(event)
+        if value == "span" and kind != "text":
+            self._span_depth += 1 if kind == "start" else -1
+        if self._span_depth:
+            return
+
+        events, self._span_events = self._span_events, []
+        text = "".join(string.strip() for kind, string, _ in events if kind == "text")
+        if "[IMAGE:" in text:
+            cleaned = text.split("✎")[0].strip()
+            self._output(("text", f"\n\n{cleaned}\n\n", None))
+        else:
+            # Not an image placeholder: pass it through, still checking nested spans
+            self._output(events[0])
+            for inner in events[1:-1]:
+                self._span_layer(inner)
+            self._output(events[-1])
+
+    # ----- html2text -----
+
+    def _output(self, event: Event) -> None:
+        kind, value, attrs = event
+        if kind == "text":
+            self._pending_output.append(value)
+            return
+        self._emit_text()
+        if kind == "start":
+            html2text.HTML2Text.handle_starttag(self, value, attrs)
+        else:
+            html2text.HTML2Text.handle_endtag(self, value)
+
+    def _emit_text(self) -> None:
+        """
+        Hands adjacent text to html2text as one run, with &, < and > as entities.
+        """
+        if not self._pending_output:
+            return
+        text = "".join(self._pending_output)
+        self._pending_output = []
+        for part in SPECIAL_CHARS_RE.split(text):
+            if part in SPECIAL_ENTITIES:
+                # What html2text.handle_entityref does, minus its self.handle_data call
+                html2text.HTML2Text.handle_data(self, self.entityref(SPECIAL_ENTITIES[part]), True)
+            elif part:
+                html2text.HTML2Text.handle_data(self, part)
+
+def editor_html_to_markdown(html_text: str) -> str:
+    """
+    Markdown for an editor document. Blocking (CPU-bound): call it from a
+    worker thread in async code.
+    """
+    return EditorMarkdownConverter().handle(html_text)
@@ -1,25 +1,49 @@
 import os
-import uuid
-import requests
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from serpapi import GoogleSearch
-
-# Directory to store downloaded images
-IMAGE_OUTPUT_DIR = "data/outputs/images"
-os.makedirs(IMAGE_OUTPUT_DIR, exist_ok=True)
+from utils.cache import ResponseCache, make_cache_key
+from utils.http_client import download_to_file
+from utils.output_store import output_store
+from utils.metrics import track_call, in_current_context
+from tools.visuals.normalize import normalize_image
 
 # Environment variable
 SERPAPI_KEY = os.getenv("SERPAPI_API_KEY")
 BASE_IMAGE_URL = "https://langgraph-lesson-modifier.onrender.com/images/"
 
+# Images larger than this are skipped (the download is aborted early).
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_MB", "10")) * 1024 * 1024
+# Whole-transfer limit for a single image download, in seconds.
+IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv("IMAGE_DOWNLOAD_TIMEOUT", "15"))
+
+# Max simultaneous SerpAPI searches / image downloads per batch.
+SEARCH_CONCURRENCY = int(os.getenv("SERPAPI_CONCURRENCY", "4"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("IMAGE_DOWNLOAD_CONCURRENCY", "6"))
+
+# query -> original image URLs; common topics skip SerpAPI for SERPAPI_CACHE_TTL seconds.
+SERPAPI_RESULTS_KEPT = 10
+serpapi_cache = ResponseCache(
+    "serpapi",
+    max_items=512,
+    max_disk_bytes=10 * 1024 * 1024,
+    ttl=float(os.getenv("SERPAPI_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
 def get_image_urls_from_serpapi(query: str, count: int = 1) -> List[str]:
     """
     Fetch image URLs from Google Images using SerpAPI.
+    Results are cached per normalized query (see SERPAPI_CACHE_TTL).
     """
     if not SERPAPI_KEY:
         print("[SerpAPI] SERPAPI_KEY is missing.")
         return []
 
+    key = make_cache_key("google_images", " ".join(query.lower().split()), "United States")
+    cached = serpapi_cache.get(key)
+    if cached is not None and (len(cached) >= count or len(cached) < SERPAPI_RESULTS_KEPT):
+        return cached[:count]
+
     try:
         params = {
             "engine": "google_images",         # Correct engine for image search
@@ -28,49 +52,82 @@ def get_image_urls_from_serpapi(query: str, count: int = 1) -> List[str]:
             "api_key": SERPAPI_KEY
         }
 
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        with track_call("serpapi"):
+            search = GoogleSearch(params)
+            results = search.get_dict()
 
         if "images_results" not in results:
             print(f"[SerpAPI] No results found for query: {query}")
             return []
 
-        # Extract original image URLs
-        image_urls = [img["original"] for img in results["images_results"][:count]]
+        # Extract original image URLs (keep a few extra for larger cached requests)
+        image_urls = [
+            img["original"]
+            for img in results["images_results"][:max(count, SERPAPI_RESULTS_KEPT)]
+            if "original" in img
+        ]
+        if image_urls:
+            serpapi_cache.set(key, image_urls)
         print(f"[SerpAPI] Fetched {len(image_urls)} images for: '{query}'")
-        return image_urls
+        return image_urls[:count]
 
     except Exception as e:
         print(f"[SerpAPI] Error fetching images for '{query}': {e}")
         return []
 
-def download_images(image_urls: List[str]) -> List[str]:
+def get_image_urls_for_queries(queries: List[str], count: int = 1) -> List[List[str]]:
     """
-    Downloads images and returns their public URLs.
+    Runs the SerpAPI searches for several queries concurrently.
+    Returns one URL list per query, in query order.
     """
-    downloaded_urls = []
-    headers = {'User-Agent': 'Mozilla/5.0'}
-
-    for url in image_urls:
-        try:
-            print(f"[Download] Downloading: {url}")
-            response = requests.get(url, headers=headers, timeout=10)
-
-            if response.status_code != 200:
-                print(f"[Download] Failed with status {response.status_code}")
-                continue
+    if not queries:
+        return []
+    with ThreadPoolExecutor(max_workers=min(SEARCH_CONCURRENCY, len(queries))) as pool:
+        return list(pool.map(in_current_context(lambda q: get_image_urls_from_serpapi(q, count)), queries))
 
-            filename = f"image_{uuid.uuid4().hex}.jpg"
-            filepath = os.path.join(IMAGE_OUTPUT_DIR, filename)
+def download_image(url: str) -> Optional[str]:
+    """
+    Downloads one image and returns its public URL, or None on failure.
+    The download is normalized to a deduplicated WebP (plus a `_thumb.webp`
+    thumbnail next to it) before it is published.
+    """
+    try:
+        print(f"[Download] Downloading: {url}")
+        filepath = output_store.temp_path("images")
+
+        result = download_to_file(
+            url,
+            filepath,
+            max_bytes=IMAGE_MAX_BYTES,
+            timeout=10,
+            max_seconds=IMAGE_DOWNLOAD_TIMEOUT
+        )
+        if result.status_code != 200:
+            print(f"[Download] Failed with status {result.status_code}")
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return None
+
+        normalized = normalize_image(filepath, result.sha256)
+        if normalized is None:
+            return None
+
+        return f"{BASE_IMAGE_URL}{normalized.filename}"
 
-            with open(filepath, "wb") as f:
-                f.write(response.content)
+    except Exception as e:
+        print(f"[Download] Error downloading image from {url}: {e}")
+        return None
 
-            public_url = f"{BASE_IMAGE_URL}{filename}"
-            downloaded_urls.append(public_url)
+def download_images(image_urls: List[str]) -> List[str]:
+    """
+    Downloads images concurrently and returns their public URLs (in input order).
+    """
+    if not image_urls:
+        return []
 
-        except Exception as e:
-            print(f"[Download] Error downloading image from {url}: {e}")
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_CONCURRENCY, len(image_urls))) as pool:
+        results = list(pool.map(in_current_context(download_image), image_urls))
 
+    downloaded_urls = [url for url in results if url]
     print(f"[Download] Total images downloaded: {len(downloaded_urls)}")
     return downloaded_urls
\ No newline at end of file
@@ -0,0 +1,76 @@
+# tools/visuals/normalize.py
+
+import os
+from typing import NamedTuple, Optional
+from PIL import Image, ImageOps
+from utils.output_store import output_store
+from utils.metrics import record_bytes_written
+
+# Editor images are downsized to this width; thumbnails to THUMB_WIDTH.
+MAX_WIDTH = int(os.getenv("IMAGE_MAX_WIDTH", "1024"))
+THUMB_WIDTH = int(os.getenv("IMAGE_THUMB_WIDTH", "240"))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+
+class NormalizedImage(NamedTuple):
+    filename: str
+    thumbnail_filename: str
+    source_format: str
+
+def image_filenames(content_hash: str) -> tuple:
+    """
+    Content-addressed names: the same picture is stored once, whichever lesson fetched it.
+    """
+    stem = f"image_{content_hash[:32]}"
+    return f"{stem}.webp", f"{stem}_thumb.webp"
+
+def _save_webp(image: Image.Image, path: str) -> None:
+    tmp_path = output_store.temp_path("images", ".tmp")
+    image.save(tmp_path, format="WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp_path, path)
+    record_bytes_written("image", os.path.getsize(path))
+
+def _resized(image: Image.Image, width: int) -> Image.Image:
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+def normalize_image(raw_path: str, content_hash: str) -> Optional[NormalizedImage]:
+    """
+    Turns a freshly downloaded file into a deduplicated WebP image plus
+    thumbnail, both written to the "images" output store category.
+
+    The raw download is always removed. Returns None when the file is not a
+    decodable image (e.g. an HTML error page served with a 200).
+    """
+    filename, thumbnail_filename = image_filenames(content_hash)
+
+    try:
+        existing = [output_store.resolve("images", name) for name in (filename, thumbnail_filename)]
+        if all(existing):
+            for path in existing:
+                output_store.touch(path)
+            return NormalizedImage(filename, thumbnail_filename, "duplicate")
+
+        path = output_store.path("images", filename)
+        thumbnail_path = output_store.path("images", thumbnail_filename)
+
+        with Image.open(raw_path) as image:
+            source_format = image.format or "unknown"
+            image.seek(0)  # first frame of animated GIF/WebP
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+            _save_webp(_resized(image, MAX_WIDTH), path)
+            _save_webp(_resized(image, THUMB_WIDTH), thumbnail_path)
+
+        return NormalizedImage(filename, thumbnail_filename, source_format)
+
+    except Exception as e:
+        print(f"[ImageNormalize] Skipping {raw_path}: {e}")
+        return None
+
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
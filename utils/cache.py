@@ -0,0 +1,176 @@
+# utils/cache.py
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from utils.metrics import CACHES, record_bytes_written
+
+CACHE_ROOT = "data/cache"
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    Content-addressed key: sha256 over the JSON encoding of all parts.
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache for JSON-serializable values.
+
+    - Memory tier: in-process LRU holding up to `max_items` entries.
+    - Disk tier: one JSON file per key under data/cache/<name>/, trimmed
+      (oldest first) whenever it grows past `max_disk_bytes`.
+
+    Entries older than `ttl` seconds (if given) are treated as misses.
+    stats() is exported on /metrics as lesson_cache_*{cache="<name>"}.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_items: int = 256,
+        max_disk_bytes: int = 200 * 1024 * 1024,
+        ttl: Optional[float] = None,
+    ):
+        self.name = name
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.cache_dir = os.path.join(CACHE_ROOT, name)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # computed lazily on first write
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        CACHES.register(name, self.stats)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            created, value = data.get("created", 0.0), data["value"]
+            if self._expired(created):
+                raise KeyError(key)
+            os.utime(path)  # keeps disk trimming least-recently-used
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, value, created)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "created": created, "value": value}, f, ensure_ascii=False)
+            # Overwriting an entry only adds the difference to the disk tier
+            try:
+                previous_size = os.path.getsize(path)
+            except FileNotFoundError:
+                previous_size = 0
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"[Cache:{self.name}] Failed to write {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        record_bytes_written("cache", size)
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += size - previous_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            return {
+                "name": self.name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, value: Any, created: float) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _disk_entries(self) -> list:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _scan_disk_bytes(self) -> int:
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _trim_disk(self) -> None:
+        # Evict oldest entries until the tier is back under 90% of its budget
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
@@ -1,39 +1,113 @@
 # utils/file_parser.py
 
 import os
-from typing import Union
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Union, Optional
 import docx2txt
 import pptx
 import fitz  # PyMuPDF
 
-def extract_text_from_file(file_path: str) -> str:
+# PDFs with at least this many pages are extracted in parallel page ranges.
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "64"))
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Only the first N pages / slides are extracted when set (0 = no limit).
+MAX_PAGES = int(os.getenv("EXTRACT_MAX_PAGES", "0")) or None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    # One long-lived pool; "spawn" avoids forking the threaded API process.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died (e.g. killed for memory): the pool is unusable, the next call starts a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def extract_text_from_file(file_path: str, max_pages: Optional[int] = MAX_PAGES) -> str:
     """
     Extracts readable text content from PDF, DOCX, or PPTX files.
+    `max_pages` caps PDFs to their first N pages and decks to their first N slides.
     """
     if file_path.lower().endswith(".pdf"):
-        return extract_text_from_pdf(file_path)
+        return extract_text_from_pdf(file_path, max_pages=max_pages)
     elif file_path.lower().endswith(".docx"):
         return extract_text_from_docx(file_path)
     elif file_path.lower().endswith(".pptx"):
-        return extract_text_from_pptx(file_path)
+        return extract_text_from_pptx(file_path, max_slides=max_pages)
     else:
         raise ValueError(f"Unsupported file type for: {file_path}")
 
-def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> str:
+    with fitz.open(file_path) as pdf:
+        return "".join(pdf[i].get_text() for i in range(start, end))
+
+def extract_text_from_pdf(
+    file_path: str,
+    max_pages: Optional[int] = None,
+    parallel: Optional[bool] = None,
+) -> str:
+    """
+    Extracts PDF text page by page.
+    Large documents (>= PDF_PARALLEL_PAGE_THRESHOLD pages) are split into
+    contiguous page ranges extracted in a process pool; `parallel` forces
+    either mode. If a pool worker dies, the ranges are retried once in a
+    fresh pool.
+    """
     with fitz.open(file_path) as pdf:
-        for page in pdf:
-            text += page.get_text()
-    return text.strip()
+        page_count = pdf.page_count
+    if max_pages:
+        page_count = min(page_count, max_pages)
+
+    if parallel is None:
+        parallel = page_count >= PDF_PARALLEL_PAGE_THRESHOLD and PDF_MAX_WORKERS > 1
+    if not parallel or page_count == 0:
+        return _extract_pdf_page_range(file_path, 0, page_count).strip()
+
+    # A few ranges per worker keeps the pool busy when page costs are uneven
+    n_ranges = min(page_count, PDF_MAX_WORKERS * 4)
+    bounds = [page_count * i // n_ranges for i in range(n_ranges + 1)]
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            parts = pool.map(
+                _extract_pdf_page_range,
+                [file_path] * n_ranges,
+                bounds[:-1],
+                bounds[1:],
+            )
+            return "".join(parts).strip()
+        except BrokenProcessPool as e:
+            _discard_pool(pool)
+            if attempt:
+                raise RuntimeError(f"PDF extraction worker crashed twice on {file_path}") from e
+            print(f"[FileParser] Process pool broken ({e}); retrying in a new pool")
 
 def extract_text_from_docx(file_path: str) -> str:
     return docx2txt.process(file_path).strip()
 
-def extract_text_from_pptx(file_path: str) -> str:
-    text = ""
+def extract_text_from_pptx(file_path: str, max_slides: Optional[int] = None) -> str:
+    parts = []
     presentation = pptx.Presentation(file_path)
-    for slide in presentation.slides:
+    for index, slide in enumerate(presentation.slides):
+        if max_slides and index >= max_slides:
+            break
         for shape in slide.shapes:
             if hasattr(shape, "text"):
-                text += shape.text + "\n"
-    return text.strip()
\ No newline at end of file
+                parts.append(shape.text)
+                parts.append("\n")
+    return "".join(parts).strip()
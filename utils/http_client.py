@@ -0,0 +1,132 @@
+# utils/http_client.py
+
+import os
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from utils.metrics import track_call, record_bytes_written
+
+# Largest body we will accept from a download before aborting.
+MAX_DOWNLOAD_BYTES = int(os.getenv("HTTP_MAX_DOWNLOAD_MB", "100")) * 1024 * 1024
+# Simultaneous requests allowed against a single host.
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "6"))
+# Set HTTP2_ENABLED=1 to negotiate HTTP/2 (needs the `h2` package).
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "").lower() in ("1", "true", "yes")
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = 20
+
+class DownloadTooLarge(ValueError):
+    pass
+
+class DownloadResult(NamedTuple):
+    status_code: int
+    headers: httpx.Headers
+    size: int
+    sha256: Optional[str]
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+def _http2_available() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("[HTTP] HTTP2_ENABLED is set but the 'h2' package is missing; using HTTP/1.1.")
+        return False
+
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide pooled client (keep-alive connections are reused across downloads).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    http2=_http2_available(),
+                    follow_redirects=True,
+                    timeout=DEFAULT_TIMEOUT,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                    headers={"User-Agent": "Mozilla/5.0"},
+                )
+    return _client
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+@contextmanager
+def host_slot(url: str):
+    """
+    Caps concurrent requests per host at MAX_CONNECTIONS_PER_HOST.
+    """
+    host = urlparse(url).netloc
+    with _client_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = _host_semaphores[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+    with semaphore:
+        yield
+
+def download_to_file(
+    url: str,
+    file_path: str,
+    headers: Optional[Dict[str, str]] = None,
+    max_bytes: int = MAX_DOWNLOAD_BYTES,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_seconds: Optional[float] = None,
+) -> DownloadResult:
+    """
+    Streams `url` to `file_path` in chunks, hashing as it goes.
+
+    Aborts with DownloadTooLarge as soon as the body (or its declared
+    Content-Length) exceeds `max_bytes`, and with httpx.TimeoutException
+    once the whole transfer takes longer than `max_seconds` (if given).
+    A 304 response writes nothing and is returned as-is; other non-2xx
+    statuses raise httpx.HTTPStatusError.
+    """
+    client = get_http_client()
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    with host_slot(url), track_call("download"):
+        with client.stream("GET", url, headers=headers, timeout=timeout) as response:
+            if response.status_code == 304:
+                return DownloadResult(304, response.headers, 0, None)
+            response.raise_for_status()
+
+            declared = response.headers.get("Content-Length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise DownloadTooLarge(f"{url} is {declared} bytes (limit {max_bytes})")
+
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                with open(file_path, "wb") as f:
+                    for chunk in response.iter_bytes(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise DownloadTooLarge(f"{url} exceeded {max_bytes} bytes")
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise httpx.TimeoutException(f"{url} took longer than {max_seconds}s")
+                        digest.update(chunk)
+                        f.write(chunk)
+            except BaseException:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                raise
+
+            record_bytes_written("download", size)
+            return DownloadResult(response.status_code, response.headers, size, digest.hexdigest())
@@ -0,0 +1,283 @@
+# utils/job_queue.py
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import traceback
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+JOB_DB_PATH = "data/jobs.sqlite3"
+
+# A job interrupted this many times is failed instead of requeued again
+# (e.g. a lesson that crashes the process every time it runs).
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# A claimed job is leased to its worker for this long and the lease is renewed
+# while the job runs (every third of it). A running job whose lease expired
+# belongs to a process that died, and is put back in the queue.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# handler(payload, report_progress) -> result; report_progress(dict) persists progress
+JobHandler = Callable[[dict, Callable[[dict], Awaitable[None]]], Awaitable[Any]]
+
+class QueueFull(RuntimeError):
+    pass
+
+class JobQueue:
+    """
+    Persistent FIFO of pipeline jobs stored in a local SQLite file.
+
+    Job status moves queued -> running -> succeeded | failed. Several
+    processes (uvicorn --workers N, overlapping deploys) can share the file:
+    a running job is only taken back once its lease expires (see
+    JOB_LEASE_SECONDS), and then requeued unless it already ran
+    `max_attempts` times.
+    """
+
+    def __init__(
+        self,
+        db_path: str = JOB_DB_PATH,
+        max_queued: int = 500,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.db_path = db_path
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "lease_until" not in columns:
+                # Databases from before leases: their running jobs count as expired
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        A connection running one transaction (committed on success), closed on exit.
+        """
+        conn = self._open()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def submit(self, kind: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            (queued,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+            if queued >= self.max_queued:
+                raise QueueFull(f"Job queue is full ({queued} jobs waiting).")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), now, now)
+            )
+        return job_id
+
+    def claim_next(self) -> Optional[dict]:
+        """
+        Atomically marks the oldest queued job as running, leased to the
+        caller, and returns it. Jobs whose lease expired are recovered first.
+        """
+        conn = self._open()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                "WHERE status = 'running' AND COALESCE(lease_until, 0) < ? AND attempts >= ?",
+                (f"Job was interrupted {self.max_attempts} time(s) (worker stopped or restarted); giving up.",
+                 now, now, self.max_attempts)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? "
+                "WHERE status = 'running' AND COALESCE(lease_until, 0) < ?",
+                (now, now)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ? WHERE id = ?",
+                (now + self.lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            return {"id": row["id"], "kind": row["kind"], "payload": json.loads(row["payload"])}
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def renew_lease(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                (time.time() + self.lease_seconds, job_id)
+            )
+
+    def set_progress(self, job_id: str, progress: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress, ensure_ascii=False), time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, result: Any = None, error: Optional[str] = None) -> None:
+        status = "failed" if error is not None else "succeeded"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False), error, time.time(), job_id)
+            )
+
+    def prune(self, max_age: float, now: Optional[float] = None) -> int:
+        """
+        Deletes succeeded and failed jobs last updated more than `max_age` seconds ago.
+        Returns the number of jobs deleted.
+        """
+        cutoff = (now if now is not None else time.time()) - max_age
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+                (cutoff,)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row["status"] == "queued":
+                (position,) = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?",
+                    (row["created_at"],)
+                ).fetchone()
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "queue_position": position,
+            "progress": json.loads(row["progress"]) if row["progress"] else None,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+class JobWorkerPool:
+    """
+    Runs queued jobs on a fixed number of asyncio workers.
+    """
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, JobHandler], workers: int = 2, poll_interval: float = 1.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self) -> None:
+        """
+        Wakes idle workers after a submit instead of waiting for the next poll.
+        """
+        self._wakeup.set()
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            # A failing iteration (e.g. "database is locked") must not end the worker
+            try:
+                job = await asyncio.to_thread(self.queue.claim_next)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job, index)
+            except Exception:
+                print(f"[Jobs] Worker {index} error; retrying in {self.poll_interval:g}s")
+                traceback.print_exc()
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run(self, job: dict, index: int) -> None:
+        job_id = job["id"]
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(self.queue.finish, job_id, None, f"Unknown job kind: {job['kind']}")
+            return
+
+        async def report_progress(progress: dict) -> None:
+            await asyncio.to_thread(self.queue.set_progress, job_id, progress)
+
+        async def keep_lease() -> None:
+            while True:
+                await asyncio.sleep(self.queue.lease_seconds / 3)
+                try:
+                    await asyncio.to_thread(self.queue.renew_lease, job_id)
+                except Exception as e:
+                    print(f"[Jobs] Could not renew the lease of job {job_id}: {e}")
+
+        print(f"[Jobs] Worker {index} running {job['kind']} job {job_id}")
+        heartbeat = asyncio.create_task(keep_lease())
+        try:
+            try:
+                result = await handler(job["payload"], report_progress)
+            except Exception as e:
+                traceback.print_exc()
+                await asyncio.to_thread(self.queue.finish, job_id, None, str(e))
+            else:
+                try:
+                    await asyncio.to_thread(self.queue.finish, job_id, result)
+                except Exception as e:
+                    # e.g. a result json.dumps cannot serialize: record the failure instead
+                    traceback.print_exc()
+                    await asyncio.to_thread(self.queue.finish, job_id, None, f"Could not store job result: {e}")
+        finally:
+            heartbeat.cancel()
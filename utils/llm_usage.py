@@ -0,0 +1,224 @@
+# utils/llm_usage.py
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from utils.metrics import Counter, REGISTRY, track_call
+
+TOKENS_USED = Counter(
+    "lesson_openai_tokens_total",
+    "OpenAI tokens by call site, model and kind (prompt, cached_prompt, completion).",
+    ("call_site", "model", "kind"),
+)
+REGISTRY.append(TOKENS_USED)
+
+def prompt_parts(messages: List[Dict[str, str]], **dynamic_chars: int) -> Dict[str, int]:
+    """
+    Character count of each part of a prompt. `dynamic_chars` are the
+    request-specific parts (e.g. lesson_text=len(text)); everything else in
+    the messages is counted as "instructions" (system prompt and template).
+    """
+    total = sum(len(message.get("content") or "") for message in messages)
+    parts = {name: chars for name, chars in dynamic_chars.items() if chars}
+    parts["instructions"] = max(total - sum(parts.values()), 0)
+    return parts
+
+class UsageTotals:
+    """
+    Running totals for a group of OpenAI calls (a call site, an endpoint or one request).
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.latency_seconds = 0.0
+        self.max_latency_seconds = 0.0
+        # Prompt tokens split across prompt parts in proportion to their length
+        self.estimated_prompt_tokens: Dict[str, float] = {}
+        self.models: Dict[str, int] = {}
+
+    def add(self, call: "LLMCall") -> None:
+        self.calls += 1
+        self.errors += 0 if call.ok else 1
+        self.prompt_tokens += call.prompt_tokens
+        self.cached_tokens += call.cached_tokens
+        self.completion_tokens += call.completion_tokens
+        self.latency_seconds += call.latency_seconds
+        self.max_latency_seconds = max(self.max_latency_seconds, call.latency_seconds)
+        self.models[call.model] = self.models.get(call.model, 0) + 1
+        for part, tokens in call.estimated_prompt_tokens().items():
+            self.estimated_prompt_tokens[part] = self.estimated_prompt_tokens.get(part, 0) + tokens
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "latency_seconds": round(self.latency_seconds, 3),
+            "avg_latency_seconds": round(self.latency_seconds / self.calls, 3) if self.calls else 0.0,
+            "max_latency_seconds": round(self.max_latency_seconds, 3),
+            "estimated_prompt_tokens": {
+                part: round(tokens) for part, tokens in sorted(self.estimated_prompt_tokens.items())
+            },
+            "models": dict(sorted(self.models.items())),
+        }
+
+class LLMCall:
+    """
+    One OpenAI request. The call site sets `usage` from the response
+    (response.usage, or the final chunk of a stream with include_usage).
+    """
+
+    def __init__(self, call_site: str, model: str, parts: Optional[Dict[str, int]] = None):
+        self.call_site = call_site
+        self.model = model
+        self.parts = parts or {}
+        self.usage = None
+        self.ok = False
+        self.latency_seconds = 0.0
+
+    @property
+    def prompt_tokens(self) -> int:
+        return getattr(self.usage, "prompt_tokens", None) or 0
+
+    @property
+    def completion_tokens(self) -> int:
+        return getattr(self.usage, "completion_tokens", None) or 0
+
+    @property
+    def cached_tokens(self) -> int:
+        details = getattr(self.usage, "prompt_tokens_details", None)
+        return getattr(details, "cached_tokens", None) or 0
+
+    def estimated_prompt_tokens(self) -> Dict[str, float]:
+        total_chars = sum(self.parts.values())
+        if not total_chars or not self.prompt_tokens:
+            return {}
+        return {part: self.prompt_tokens * chars / total_chars for part, chars in self.parts.items()}
+
+class RequestUsage:
+    """
+    OpenAI usage of one API request or job, split by call site.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: List[LLMCall] = []
+        self.totals = UsageTotals()
+        self.by_call_site: Dict[str, UsageTotals] = {}
+        self._lock = threading.Lock()
+
+    def add(self, call: LLMCall) -> None:
+        with self._lock:
+            self.calls.append(call)
+            self.totals.add(call)
+            self.by_call_site.setdefault(call.call_site, UsageTotals()).add(call)
+
+    def summary(self) -> str:
+        with self._lock:
+            t = self.totals
+            sites = ", ".join(
+                f"{site} x{totals.calls} ({totals.prompt_tokens}+{totals.completion_tokens})"
+                for site, totals in sorted(self.by_call_site.items())
+            )
+            return (
+                f"{self.name}: {t.calls} OpenAI calls, {t.prompt_tokens} prompt "
+                f"({t.cached_tokens} cached) + {t.completion_tokens} completion tokens, "
+                f"{t.latency_seconds:.1f}s in calls; {sites}"
+            )
+
+class UsageLedger:
+    """
+    Process-wide usage totals per call site and per endpoint, since start-up.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.by_call_site: Dict[str, UsageTotals] = {}
+        self.by_endpoint: Dict[str, UsageTotals] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, call: LLMCall) -> None:
+        TOKENS_USED.inc(call.prompt_tokens, call_site=call.call_site, model=call.model, kind="prompt")
+        TOKENS_USED.inc(call.cached_tokens, call_site=call.call_site, model=call.model, kind="cached_prompt")
+        TOKENS_USED.inc(call.completion_tokens, call_site=call.call_site, model=call.model, kind="completion")
+        with self._lock:
+            self.by_call_site.setdefault(call.call_site, UsageTotals()).add(call)
+
+    def record_request(self, request: RequestUsage) -> None:
+        with request._lock:
+            calls = list(request.calls)
+        with self._lock:
+            self.requests += 1
+            endpoint = self.by_endpoint.setdefault(request.name, UsageTotals())
+            for call in calls:
+                endpoint.add(call)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "since": self.started_at,
+                "requests": self.requests,
+                "call_sites": {site: totals.as_dict() for site, totals in sorted(self.by_call_site.items())},
+                "endpoints": {name: totals.as_dict() for name, totals in sorted(self.by_endpoint.items())},
+            }
+
+usage_ledger = UsageLedger()
+
+_current_request: contextvars.ContextVar[Optional[RequestUsage]] = contextvars.ContextVar("llm_request_usage", default=None)
+
+@contextmanager
+def openai_call(call_site: str, model: str, parts: Optional[Dict[str, int]] = None):
+    """
+    Wraps one OpenAI request:
+
+        with openai_call("modify.lesson", MODEL, prompt_parts(messages, lesson_text=len(text))) as call:
+            response = client.chat.completions.create(...)
+            call.usage = response.usage
+
+    Also times it as an "openai" outbound call (utils.metrics).
+    """
+    call = LLMCall(call_site, model, parts)
+    start = time.perf_counter()
+    try:
+        with track_call("openai"):
+            yield call
+        call.ok = True
+    finally:
+        call.latency_seconds = time.perf_counter() - start
+        usage_ledger.record_call(call)
+        request = _current_request.get()
+        if request is not None:
+            request.add(call)
+
+@contextmanager
+def usage_scope(name: str):
+    """
+    Attributes the OpenAI calls made inside the block (including graph nodes
+    and worker threads started from it) to one request, e.g.
+    "POST /full-pipeline". On exit, adds them to the endpoint totals and
+    logs a one-line summary.
+    """
+    request = RequestUsage(name)
+    token = _current_request.set(request)
+    try:
+        yield request
+    finally:
+        try:
+            _current_request.reset(token)
+        except ValueError:
+            # Exited from another context (e.g. a stream closed by the server)
+            pass
+        usage_ledger.record_request(request)
+        if request.calls:
+            print(f"[LLMUsage] {request.summary()}")
@@ -0,0 +1,240 @@
+# utils/metrics.py
+
+import time
+import bisect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds, from cache hits to multi-minute GPT-4o runs.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class CacheStats:
+    """
+    Hit/miss counters and sizes of every utils.cache.ResponseCache, read from
+    ResponseCache.stats() at scrape time. A cache created again under the
+    same name replaces the old one.
+    """
+
+    # (metric suffix, stats() field, type, help)
+    FIELDS = (
+        ("hits_total", "hits", "counter", "Cache lookups answered from memory or disk."),
+        ("disk_hits_total", "disk_hits", "counter", "Cache lookups answered from the disk tier."),
+        ("misses_total", "misses", "counter", "Cache lookups that found nothing (or an expired entry)."),
+        ("memory_items", "memory_items", "gauge", "Entries held in the in-memory tier."),
+        ("disk_bytes", "disk_bytes", "gauge", "Bytes used by the on-disk tier."),
+    )
+
+    def __init__(self, name: str):
+        self.name = name
+        self._sources: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, cache_name: str, stats: Callable[[], dict]) -> None:
+        with self._lock:
+            self._sources[cache_name] = stats
+
+    def render(self) -> List[str]:
+        with self._lock:
+            sources = sorted(self._sources.items())
+        snapshots = [(cache_name, stats()) for cache_name, stats in sources]
+
+        lines = []
+        for suffix, field, kind, help in self.FIELDS:
+            metric = f"{self.name}_{suffix}"
+            lines.append(f"# HELP {metric} {help}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for cache_name, snapshot in snapshots:
+                lines.append(f"{metric}{_format_labels(('cache',), (cache_name,))} {_format_value(snapshot[field])}")
+        return lines
+
+NODE_DURATION = Histogram(
+    "lesson_node_duration_seconds",
+    "Wall time of each pipeline graph node.",
+    ("node", "outcome"),
+)
+OUTBOUND_DURATION = Histogram(
+    "lesson_outbound_call_duration_seconds",
+    "Latency of calls to external services (OpenAI, SerpAPI, file downloads).",
+    ("service", "outcome"),
+)
+BYTES_WRITTEN = Counter(
+    "lesson_bytes_written_total",
+    "Bytes written to local storage, by kind of file.",
+    ("kind",),
+)
+CACHES = CacheStats("lesson_cache")
+REGISTRY = [NODE_DURATION, OUTBOUND_DURATION, BYTES_WRITTEN, CACHES]
+
+def render_prometheus() -> str:
+    """
+    All metrics in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ----- per-node collection -----
+
+class NodeTimings:
+    """
+    What one graph node did: outbound calls per service and bytes written.
+    Filled from any thread/task that runs in the node's context.
+    """
+
+    def __init__(self, node: str):
+        self.node = node
+        self.calls: Dict[str, List[float]] = {}
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, service: str, seconds: float) -> None:
+        with self._lock:
+            self.calls.setdefault(service, []).append(seconds)
+
+    def record_bytes(self, size: int) -> None:
+        with self._lock:
+            self.bytes_written += size
+
+    def as_dict(self, wall_seconds: float) -> dict:
+        with self._lock:
+            calls = {
+                service: {
+                    "count": len(latencies),
+                    "total_seconds": round(sum(latencies), 4),
+                    "max_seconds": round(max(latencies), 4),
+                }
+                for service, latencies in sorted(self.calls.items())
+            }
+            return {"wall_seconds": round(wall_seconds, 4), "calls": calls, "bytes_written": self.bytes_written}
+
+_current_node: contextvars.ContextVar[Optional[NodeTimings]] = contextvars.ContextVar("current_node", default=None)
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """
+    Wraps an async graph node: its wall time goes to NODE_DURATION, and a
+    summary of the node (see NodeTimings.as_dict) is added to the state's
+    `timings` under `name`.
+    """
+    @functools.wraps(node)
+    async def instrumented(state):
+        timings = NodeTimings(name)
+        token = _current_node.set(timings)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await node(state)
+            outcome = "ok"
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_node.reset(token)
+            NODE_DURATION.observe(elapsed, node=name, outcome=outcome)
+
+        merged = dict(state.get("timings") or {})
+        merged[name] = timings.as_dict(elapsed)
+        result.update({"timings": merged})
+        return result
+    return instrumented
+
+@contextmanager
+def track_call(service: str):
+    """
+    Times an outbound call; works around sync code and across awaits alike.
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        OUTBOUND_DURATION.observe(elapsed, service=service, outcome=outcome)
+        timings = _current_node.get()
+        if timings is not None:
+            timings.record_call(service, elapsed)
+
+def record_bytes_written(kind: str, size: int) -> None:
+    BYTES_WRITTEN.inc(size, kind=kind)
+    timings = _current_node.get()
+    if timings is not None:
+        timings.record_bytes(size)
+
+def in_current_context(fn: Callable) -> Callable:
+    """
+    Binds `fn` to the caller's context, so work handed to a thread pool is
+    still attributed to the node that submitted it.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
@@ -0,0 +1,322 @@
+# utils/output_store.py
+
+import os
+import re
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+STORE_ROOT = "data"
+OUTPUT_REFS_DB_PATH = "data/output_refs.sqlite3"
+
+# New files younger than this are never collected, so a run that is still
+# producing audio/images is not raced by GC before its lesson is saved.
+GC_GRACE_SECONDS = float(os.getenv("OUTPUT_GC_GRACE_SECONDS", "3600"))
+
+DAY = 24 * 3600
+MB = 1024 * 1024
+
+class Category(NamedTuple):
+    """
+    directory: relative to STORE_ROOT
+    ttl: seconds since last write/use before a file expires (0 = never)
+    quota: max bytes kept for the category, oldest evicted first (0 = unlimited)
+    owner: files in this category hold references to audio/images
+    """
+    directory: str
+    ttl: float
+    quota: int
+    owner: bool = False
+
+def _policy(name: str, directory: str, ttl_days: float, quota_mb: int, owner: bool = False) -> Category:
+    # Overridable per category, e.g. OUTPUT_TTL_DAYS_AUDIO=60, OUTPUT_QUOTA_MB_IMAGES=4096
+    ttl_days = float(os.getenv(f"OUTPUT_TTL_DAYS_{name.upper()}", str(ttl_days)))
+    quota_mb = int(os.getenv(f"OUTPUT_QUOTA_MB_{name.upper()}", str(quota_mb)))
+    return Category(directory, ttl_days * DAY, quota_mb * MB, owner)
+
+CATEGORIES: Dict[str, Category] = {
+    "final": _policy("final", "outputs/final", 90, 1024, owner=True),
+    # Rendered from the final .txt on demand, so cheap to drop
+    "json": _policy("json", "outputs/json", 14, 256),
+    "markdown": _policy("markdown", "outputs/markdown", 14, 256),
+    # Lessons saved from the editor are user work: kept unless configured otherwise
+    "saved": _policy("saved", "outputs/saved", 0, 0, owner=True),
+    "audio": _policy("audio", "outputs/audio", 30, 2048),
+    "images": _policy("images", "outputs/images", 30, 1024),
+    "inputs": _policy("inputs", "inputs", 7, 1024),
+}
+
+SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+# [AUDIO:name.mp3], [AUDIO: https://.../audio/name.mp3], [IMAGE:name.webp]
+MARKER_REF_RE = re.compile(r"\[(AUDIO|IMAGE):\s*([^\]\s]+)\s*\]")
+# Plain links, e.g. markdown ![](https://.../images/name.webp)
+URL_REF_RE = re.compile(r"/(audio|images)/([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+def shard_for(filename: str) -> str:
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()[:2]
+
+def is_safe_name(filename: str) -> bool:
+    return bool(SAFE_NAME_RE.match(filename))
+
+def safe_name(filename: str) -> str:
+    """
+    Reduces an arbitrary (e.g. uploaded) file name to characters the store accepts.
+    """
+    cleaned = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.basename(filename)).lstrip("._")
+    return cleaned or "file"
+
+def extract_references(text: str) -> Set[Tuple[str, str]]:
+    """
+    (category, filename) of every audio clip and image a lesson links to.
+    Image references include the matching `_thumb.webp`.
+    """
+    refs = set()
+    for kind, target in MARKER_REF_RE.findall(text):
+        refs.add(("audio" if kind == "AUDIO" else "images", os.path.basename(target)))
+    refs.update(URL_REF_RE.findall(text))
+
+    for category, filename in list(refs):
+        if category == "images" and filename.endswith(".webp") and not filename.endswith("_thumb.webp"):
+            refs.add(("images", f"{filename[:-len('.webp')]}_thumb.webp"))
+    return {(category, filename) for category, filename in refs if is_safe_name(filename)}
+
+class OutputStore:
+    """
+    Generated and downloaded files, stored as <category dir>/<shard>/<filename>
+    where <shard> is the first two hex digits of sha256(filename). Public URLs
+    keep using the bare filename; resolve() maps it back to the shard.
+
+    collect_garbage() applies each category's TTL and quota. Audio and images
+    referenced by a live final lesson or saved markdown are never collected.
+    Files from before sharding (directly in the category dir) are still found
+    and are moved into their shard by the next GC run.
+    """
+
+    def __init__(self, root: str = STORE_ROOT, db_path: str = OUTPUT_REFS_DB_PATH,
+                 categories: Optional[Dict[str, Category]] = None):
+        self.root = root
+        self.db_path = db_path
+        self.categories = categories or CATEGORIES
+        self._gc_lock = threading.Lock()
+        for category in self.categories:
+            os.makedirs(self.directory(category), exist_ok=True)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS refs (
+                    owner TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    PRIMARY KEY (owner, target)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS refs_target ON refs (target)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        A connection running one transaction (committed on success), closed on exit.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ----- paths -----
+
+    def directory(self, category: str) -> str:
+        return os.path.join(self.root, self.categories[category].directory)
+
+    def path(self, category: str, filename: str) -> str:
+        """
+        Where `filename` lives (or will be written) in `category`; creates the shard dir.
+        """
+        if not is_safe_name(filename):
+            raise ValueError(f"Invalid output filename: {filename!r}")
+        shard_dir = os.path.join(self.directory(category), shard_for(filename))
+        os.makedirs(shard_dir, exist_ok=True)
+        return os.path.join(shard_dir, filename)
+
+    def resolve(self, category: str, filename: str) -> Optional[str]:
+        """
+        Path of an existing file, or None. Unsafe names never resolve.
+        """
+        if category not in self.categories or not is_safe_name(filename):
+            return None
+        base = self.directory(category)
+        for path in (os.path.join(base, shard_for(filename), filename), os.path.join(base, filename)):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def temp_path(self, category: str, suffix: str = ".part") -> str:
+        """
+        Scratch file in the category root (same filesystem, so os.replace is atomic).
+        Stale ones are removed by GC.
+        """
+        return os.path.join(self.directory(category), f".{uuid.uuid4().hex}{suffix}")
+
+    def touch(self, path: str) -> None:
+        """
+        Marks a file as used so its TTL starts over.
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    # ----- references -----
+
+    def record_references(self, owner_category: str, owner_filename: str, text: str) -> None:
+        """
+        Replaces the set of audio/images that `owner_filename` links to.
+        """
+        owner = f"{owner_category}/{owner_filename}"
+        targets = sorted(f"{category}/{filename}" for category, filename in extract_references(text))
+        with self._connect() as conn:
+            conn.execute("DELETE FROM refs WHERE owner = ?", (owner,))
+            conn.executemany("INSERT OR IGNORE INTO refs (owner, target) VALUES (?, ?)",
+                             [(owner, target) for target in targets])
+
+    def _record_file_references(self, owner_category: str, owner_filename: str, path: str) -> None:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            self.record_references(owner_category, owner_filename, f.read())
+
+    def _forget_owners(self, owners: Iterable[str]) -> None:
+        owners = list(owners)
+        if owners:
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM refs WHERE owner = ?", [(owner,) for owner in owners])
+
+    def _live_references(self) -> Set[str]:
+        """
+        Targets referenced by owners that still exist; references of vanished owners are dropped.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT owner, target FROM refs").fetchall()
+
+        live, dead, exists = set(), set(), {}
+        for owner, target in rows:
+            if owner not in exists:
+                category, _, filename = owner.partition("/")
+                exists[owner] = self.resolve(category, filename) is not None
+            if exists[owner]:
+                live.add(target)
+            else:
+                dead.add(owner)
+        self._forget_owners(dead)
+        return live
+
+    # ----- garbage collection -----
+
+    def _migrate_legacy_files(self, category: str) -> None:
+        """
+        Moves files written before sharding (directly in the category dir) into their shard.
+        """
+        with os.scandir(self.directory(category)) as top:
+            flat = [entry.name for entry in top if entry.is_file(follow_symlinks=False) and is_safe_name(entry.name)]
+        for filename in flat:
+            target_category = self._legacy_category(category, filename)
+            path = self.path(target_category, filename)
+            os.replace(os.path.join(self.directory(category), filename), path)
+            if self.categories[target_category].owner:
+                self._record_file_references(target_category, filename, path)
+
+    def _scan(self, category: str) -> List[Tuple[str, str, int, float]]:
+        """
+        (path, filename, size, mtime) of every file in the category.
+        """
+        entries = []
+        with os.scandir(self.directory(category)) as top:
+            for entry in top:
+                if entry.is_dir(follow_symlinks=False):
+                    with os.scandir(entry.path) as shard:
+                        for item in shard:
+                            if item.is_file(follow_symlinks=False):
+                                stat = item.stat()
+                                entries.append((item.path, item.name, stat.st_size, stat.st_mtime))
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat()
+                    entries.append((entry.path, entry.name, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _legacy_category(self, category: str, filename: str) -> str:
+        # Editor saves used to share the markdown dir with rendered lessons
+        if category == "markdown" and "saved" in self.categories and not filename.startswith("final_lesson_"):
+            return "saved"
+        return category
+
+    def _remove(self, path: str, now: float) -> bool:
+        # Re-check age: the file may have been rewritten or reused since the scan
+        try:
+            if now - os.stat(path).st_mtime < GC_GRACE_SECONDS:
+                return False
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def collect_garbage(self, now: Optional[float] = None) -> Dict[str, dict]:
+        """
+        One GC pass over every category. Returns per-category
+        {"files", "bytes", "deleted", "freed_bytes", "over_quota"} after collection.
+        """
+        now = now or time.time()
+        with self._gc_lock:
+            for name in self.categories:
+                self._migrate_legacy_files(name)
+            live = self._live_references()
+            return {
+                name: self._collect_category(name, category, live, now)
+                for name, category in self.categories.items()
+            }
+
+    def _collect_category(self, name: str, category: Category, live: Set[str], now: float) -> dict:
+        deleted = freed = 0
+        deleted_owners = []
+        remaining = []
+
+        def remove(path: str, filename: str, size: int) -> bool:
+            nonlocal deleted, freed
+            if f"{name}/{filename}" in live or not self._remove(path, now):
+                return False
+            deleted += 1
+            freed += size
+            if category.owner:
+                deleted_owners.append(f"{name}/{filename}")
+            return True
+
+        for path, filename, size, mtime in self._scan(name):
+            if filename.startswith("."):
+                # Temp file of a write that never finished
+                remove(path, filename, size)
+                continue
+            if category.ttl and now - mtime > category.ttl and remove(path, filename, size):
+                continue
+            remaining.append((path, filename, size, mtime))
+
+        total = sum(size for _, _, size, _ in remaining)
+        files = len(remaining)
+        if category.quota and total > category.quota:
+            for path, filename, size, _ in sorted(remaining, key=lambda entry: entry[3]):
+                if total <= category.quota:
+                    break
+                if remove(path, filename, size):
+                    total -= size
+                    files -= 1
+
+        self._forget_owners(deleted_owners)
+        over_quota = bool(category.quota and total > category.quota)
+        if over_quota:
+            print(f"[OutputStore] {name} is still over quota ({total} > {category.quota} bytes); "
+                  "remaining files are referenced or too new to collect.")
+        return {"files": files, "bytes": total, "deleted": deleted, "freed_bytes": freed, "over_quota": over_quota}
+
+output_store = OutputStore()
@@ -0,0 +1,128 @@
+# utils/source_cache.py
+
+import os
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from typing import Dict, List, Tuple
+
+from utils.cache import ResponseCache
+from utils.http_client import download_to_file
+from utils.file_parser import extract_text_from_file, MAX_PAGES
+from utils.output_store import output_store, safe_name
+
+# A source validated less than this many seconds ago is reused without
+# contacting the origin at all; older entries are revalidated with a
+# conditional GET (ETag / Last-Modified).
+FRESH_SECONDS = float(os.getenv("SOURCE_CACHE_FRESH_SECONDS", "300"))
+
+# Bump when utils/file_parser.py output changes so cached text is re-extracted.
+EXTRACTOR_VERSION = "1"
+
+# url -> {"content_hash", "ext", "etag", "last_modified", "validated_at"}
+source_index = ResponseCache("sources", max_items=512, max_disk_bytes=5 * 1024 * 1024)
+# content hash -> extracted text
+extracted_text_cache = ResponseCache("extracted_text", max_items=128, max_disk_bytes=100 * 1024 * 1024)
+
+# url -> [lock, number of threads holding or waiting for it]; an entry is
+# dropped when its last user leaves, so the dict only holds URLs in use.
+_url_locks: Dict[str, List] = {}
+_url_locks_guard = threading.Lock()
+
+@contextmanager
+def _url_lock(url: str):
+    with _url_locks_guard:
+        entry = _url_locks.setdefault(url, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _url_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _url_locks[url]
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+def source_filename(content_hash: str, ext: str) -> str:
+    return safe_name(f"{content_hash}{ext}")
+
+def get_lesson_source(url: str) -> Tuple[str, str]:
+    """
+    Returns (file_path, content_hash) for the lesson at `url`.
+
+    Files are stored once per content hash in the "inputs" output store
+    category. Known URLs are revalidated with ETag / Last-Modified, and
+    skipped entirely while still fresh.
+    """
+    key = _url_key(url)
+
+    # Concurrent runs for the same lesson wait for one download instead of racing.
+    with _url_lock(url):
+        entry = source_index.get(key)
+        path = None
+        if entry:
+            path = output_store.resolve("inputs", source_filename(entry["content_hash"], entry["ext"]))
+            if path is None:
+                entry = None  # collected by GC; download again
+            elif time.time() - entry.get("validated_at", 0) < FRESH_SECONDS:
+                output_store.touch(path)
+                return path, entry["content_hash"]
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        tmp_path = output_store.temp_path("inputs", ".tmp")
+        try:
+            result = download_to_file(url, tmp_path, headers=headers, timeout=20)
+        except Exception as e:
+            raise RuntimeError(f"Failed to download file: {url} — {str(e)}")
+
+        if result.status_code == 304:
+            if entry:
+                entry["validated_at"] = time.time()
+                source_index.set(key, entry)
+                output_store.touch(path)
+                return path, entry["content_hash"]
+            raise RuntimeError(f"Failed to download file: {url} — unexpected 304 Not Modified")
+
+        content_hash = result.sha256
+        ext = os.path.splitext(os.path.basename(urlparse(url).path))[1] or ".bin"
+        path = output_store.path("inputs", source_filename(content_hash, ext))
+
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            output_store.touch(path)
+        else:
+            os.replace(tmp_path, path)
+
+        source_index.set(key, {
+            "content_hash": content_hash,
+            "ext": ext,
+            "etag": result.headers.get("ETag"),
+            "last_modified": result.headers.get("Last-Modified"),
+            "validated_at": time.time(),
+        })
+        return path, content_hash
+
+def extract_text_cached(file_path: str, content_hash: str) -> str:
+    """
+    extract_text_from_file, memoized per content hash.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    key = f"{content_hash}{ext}-v{EXTRACTOR_VERSION}-p{MAX_PAGES or 0}"
+    text = extracted_text_cache.get(key)
+    if text is not None:
+        return text
+
+    text = extract_text_from_file(file_path)
+    extracted_text_cache.set(key, text)
+    return text
@@ -0,0 +1,48 @@
+# utils/tokenizer.py
+
+import re
+import threading
+from typing import Optional
+
+TOKENIZER_MODEL = "gpt-4o"
+
+# Words and individual punctuation marks; a floor for scripts where
+# characters-per-token is far below the English average.
+WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+def _get_encoding() -> Optional[object]:
+    """
+    The tiktoken encoding for TOKENIZER_MODEL, or None when tiktoken is not
+    installed or its BPE file cannot be loaded (it is downloaded on first use;
+    point TIKTOKEN_CACHE_DIR at a pre-populated directory for offline hosts).
+    """
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+            except Exception as e:
+                print(f"[Tokenizer] tiktoken unavailable, using approximate token counts: {e}")
+                _encoding = None
+            _encoding_loaded = True
+        return _encoding
+
+def approximate_tokens(text: str) -> int:
+    # ~4 characters per token for English text
+    return max((len(text) + 3) // 4, len(WORD_RE.findall(text)))
+
+def count_tokens(text: str) -> int:
+    """
+    Number of GPT-4o tokens in `text` (approximate without tiktoken).
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return approximate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))